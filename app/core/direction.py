@@ -4,7 +4,6 @@ Determine le biais directionnel a partir du timeframe superieur.
 6 votes : EMA Cross, Structure, RSI, MACD, ADX+DI, EMA200.
 """
 import logging
-import math
 from app.core.indicators import compute_all_indicators, MarketStructure
 from app.config import SETTINGS
 
@@ -13,6 +12,27 @@ logger = logging.getLogger(__name__)
 _DEFAULT_DIR_CFG = SETTINGS["direction"]
 
 
+def _consensus(long_votes: int, short_votes: int) -> tuple[str, int]:
+    # Forte conviction : 4+ votes sur 6
+    if long_votes >= 5:
+        return "long", 100
+    elif long_votes >= 4:
+        return "long", 85
+    elif long_votes >= 3 and short_votes <= 1:
+        return "long", 65
+    elif short_votes >= 5:
+        return "short", 100
+    elif short_votes >= 4:
+        return "short", 85
+    elif short_votes >= 3 and long_votes <= 1:
+        return "short", 65
+    return "neutral", 40
+
+
+# (bias, score) pour chaque combinaison de votes 0..6, indexe par long * 7 + short
+_BIAS_TABLE = tuple(_consensus(lv, sv) for lv in range(7) for sv in range(7))
+
+
 def evaluate_direction(indicators: dict, config: dict = None) -> dict:
     dir_cfg = config or _DEFAULT_DIR_CFG
     if not indicators:
@@ -72,7 +92,7 @@ def evaluate_direction(indicators: dict, config: dict = None) -> dict:
 
     # --- Vote 4: MACD Histogram ---
     macd_hist = indicators.get("last_macd_histogram")
-    if macd_hist is not None and not (isinstance(macd_hist, float) and math.isnan(macd_hist)):
+    if macd_hist is not None and macd_hist == macd_hist:
         if macd_hist > 0:
             long_votes += 1
             signals.append(f"MACD histogram positif ({macd_hist:.6f})")
@@ -91,7 +111,7 @@ def evaluate_direction(indicators: dict, config: dict = None) -> dict:
     plus_di = indicators.get("last_plus_di")
     minus_di = indicators.get("last_minus_di")
 
-    if adx_val is not None and not (isinstance(adx_val, float) and math.isnan(adx_val)):
+    if adx_val is not None and adx_val == adx_val:
         if adx_val > 20:
             # Tendance assez forte pour voter
             if plus_di and minus_di:
@@ -113,7 +133,7 @@ def evaluate_direction(indicators: dict, config: dict = None) -> dict:
 
     # --- Vote 6: Prix vs EMA 200 (tendance macro) ---
     ema_200 = indicators.get("last_ema_200")
-    if ema_200 is not None and price > 0 and not (isinstance(ema_200, float) and math.isnan(ema_200)):
+    if ema_200 is not None and price > 0 and ema_200 == ema_200:
         distance_200 = ((price - ema_200) / ema_200) * 100
         if price > ema_200:
             long_votes += 1
@@ -130,28 +150,7 @@ def evaluate_direction(indicators: dict, config: dict = None) -> dict:
     if total == 0:
         return {"bias": "neutral", "score": 0, "signals": signals}
 
-    # Forte conviction : 4+ votes sur 6
-    if long_votes >= 5:
-        bias = "long"
-        score = 100
-    elif long_votes >= 4:
-        bias = "long"
-        score = 85
-    elif long_votes >= 3 and short_votes <= 1:
-        bias = "long"
-        score = 65
-    elif short_votes >= 5:
-        bias = "short"
-        score = 100
-    elif short_votes >= 4:
-        bias = "short"
-        score = 85
-    elif short_votes >= 3 and long_votes <= 1:
-        bias = "short"
-        score = 65
-    else:
-        bias = "neutral"
-        score = 40
+    bias, score = _BIAS_TABLE[long_votes * 7 + short_votes]
 
     return {
         "bias": bias,
@@ -3,37 +3,195 @@ COUCHE C : Entry Triggers
 Detecte les setups d'entree sur le timeframe d'analyse.
 Confirmations avancees: OBV, MACD, Stoch RSI, Ichimoku, divergence MACD.
 """
-import logging
-import math
+from dataclasses import dataclass
+from functools import lru_cache
 from app.config import SETTINGS
 
-logger = logging.getLogger(__name__)
-
 _DEFAULT_ENTRY_CFG = SETTINGS["entry"]
 SCORING_CFG = SETTINGS["scoring"]
 
 
+@dataclass(frozen=True, slots=True)
+class EntryParams:
+    """Seuils de la section `entry` d'une config, convertis une fois (pourcentages deja divises)."""
+    bb_squeeze_threshold: float
+    volume_spike_ratio: float
+    retest_buffer: float
+    rejection_wick_ratio: float
+    ema_bounce_proximity: float
+
+
+# Biais directionnel -> sens autorises ; "neutral" autorise les deux
+_ALLOW_LONG = 1
+_ALLOW_SHORT = 2
+_BIAS_MASKS = {"long": _ALLOW_LONG, "short": _ALLOW_SHORT, "neutral": _ALLOW_LONG | _ALLOW_SHORT}
+
+# id(cfg) -> (cfg, EntryParams) ; une entree par config de bot (V1..V4)
+_params_cache: dict[int, tuple[dict, EntryParams]] = {}
+
+
+def _entry_params(cfg: dict) -> EntryParams:
+    cached = _params_cache.get(id(cfg))
+    if cached is not None and cached[0] is cfg:
+        return cached[1]
+    params = EntryParams(
+        bb_squeeze_threshold=float(cfg["bb_squeeze_threshold"]),
+        volume_spike_ratio=float(cfg["volume_spike_ratio"]),
+        retest_buffer=cfg["retest_buffer_pct"] / 100,
+        rejection_wick_ratio=float(cfg["rejection_wick_ratio"]),
+        ema_bounce_proximity=cfg["ema_bounce_proximity_pct"] / 100,
+    )
+    if len(_params_cache) >= 16:
+        _params_cache.clear()
+    _params_cache[id(cfg)] = (cfg, params)
+    return params
+
+
+# Gabarits des raisons : formates a la lecture de Setup.reason, pas a la detection
+_REASON_BREAKOUT_LONG = "Breakout BB haussier (BW={:.3f}%, vol={:.1f}x){}"
+_REASON_BREAKOUT_SHORT = "Breakout BB baissier (BW={:.3f}%, vol={:.1f}x){}"
+_REASON_RETEST_LONG = "Retest support {:.6f} avec rejection{}{}"
+_REASON_RETEST_SHORT = "Retest resistance {:.6f} avec rejection{}{}"
+_REASON_DIVERGENCE_LONG = "Divergence haussiere {} (prix lower low, indicateur higher low)"
+_REASON_DIVERGENCE_SHORT = "Divergence baissiere {} (prix higher high, indicateur lower high)"
+_REASON_EMA_BOUNCE_LONG = "Bounce EMA20 haussier ({}, dist={:.3f}%){}{}"
+_REASON_EMA_BOUNCE_SHORT = "Bounce EMA20 baissier ({}, dist={:.3f}%){}{}"
+_REASON_MOMENTUM_LONG = "Momentum haussier fort (RSI {:.1f}, ADX {:.1f})"
+_REASON_MOMENTUM_SHORT = "Momentum baissier fort (RSI {:.1f}, ADX {:.1f})"
+
+# Parametres par sens des detecteurs : sign = +1 (long) / -1 (short) ramene les comparaisons
+# miroir (x > seuil vs x < seuil) a un seul predicat `x * sign > seuil * sign`.
+# (direction, sign, bit de biais, gabarit)
+_BREAKOUT_SIDES = (
+    ("long", 1, _ALLOW_LONG, _REASON_BREAKOUT_LONG),
+    ("short", -1, _ALLOW_SHORT, _REASON_BREAKOUT_SHORT),
+)
+# (direction, sign, bit de biais, seuil Stoch fort, seuil Stoch modere, label fort, label modere, gabarit)
+_RETEST_SIDES = (
+    ("long", 1, _ALLOW_LONG, 20, 35, " + Stoch RSI oversold", " + Stoch RSI bas", _REASON_RETEST_LONG),
+    ("short", -1, _ALLOW_SHORT, 80, 65, " + Stoch RSI overbought", " + Stoch RSI haut", _REASON_RETEST_SHORT),
+)
+# bias_mask -> (direction, sign, pattern attendu, label Ichimoku, gabarit) ; biais neutre exclu
+_EMA_BOUNCE_SIDES = {
+    _ALLOW_LONG: ("long", 1, "bullish", " + au-dessus Ichimoku", _REASON_EMA_BOUNCE_LONG),
+    _ALLOW_SHORT: ("short", -1, "bearish", " + sous Ichimoku", _REASON_EMA_BOUNCE_SHORT),
+}
+# (direction, sign, bit de biais, seuil RSI, seuil RSI fort, gabarit) ; short evalue en premier
+_MOMENTUM_SIDES = (
+    ("short", -1, _ALLOW_SHORT, 35, 25, _REASON_MOMENTUM_SHORT),
+    ("long", 1, _ALLOW_LONG, 65, 75, _REASON_MOMENTUM_LONG),
+)
+
+
+@dataclass(slots=True)
+class Setup:
+    type: str  # "breakout", "retest", "divergence", "ema_bounce", "momentum"
+    direction: str  # "long", "short"
+    entry_price: float
+    pattern_score: int
+    vol_score: int
+    reason_fmt: str
+    reason_args: tuple = ()
+    key_level: float | None = None
+    confluence_score: int = 0
+    all_setups: tuple = ()
+
+    @property
+    def reason(self) -> str:
+        return self.reason_fmt.format(*self.reason_args)
+
+
+@dataclass(slots=True)
+class IndicatorSnapshot:
+    """Valeurs scalaires du bundle d'indicateurs, lues une seule fois par evaluation."""
+    close: float
+    bb_bandwidth: float
+    bb_upper: float
+    bb_lower: float
+    volume_ratio: float
+    macd_histogram: float  # NaN/None -> 0
+    rsi: float
+    adx: float
+    plus_di: float
+    minus_di: float
+    ema_fast: float
+    ema_slow: float
+    vwap: float  # NaN/None -> 0
+    stoch_k: float  # NaN/None -> 50
+    engulfing: str
+    pin_bar: str
+    divergence: str
+    macd_divergence: str
+    obv_trend_up: bool
+    cloud_top: float | None
+    cloud_bottom: float | None
+    recent_high: float | None
+    recent_low: float | None
+
+    @property
+    def vol_score(self) -> int:
+        # Score volume commun a retest et ema_bounce, calcule seulement quand un de ces setups sort
+        # (volume_ratio peut etre NaN : historique court, moyenne de volume nulle)
+        return min(20, int(self.volume_ratio * 10))
+
+
+def _unpack_indicators(indicators: dict) -> IndicatorSnapshot:
+    """
+    Les cles last_* et patterns sont toujours produites par compute_all_indicators :
+    lecture directe. Seuls les scalaires precalculues optionnels passent par get().
+    MACD, VWAP et Stoch RSI sont nettoyes (NaN -> defaut) ici, une fois pour tous les detecteurs.
+    """
+    get = indicators.get
+    return IndicatorSnapshot(
+        close=indicators["last_close"],
+        bb_bandwidth=indicators["last_bb_bandwidth"],
+        bb_upper=indicators["last_bb_upper"],
+        bb_lower=indicators["last_bb_lower"],
+        volume_ratio=indicators["last_volume_ratio"],
+        macd_histogram=_safe_val(indicators["last_macd_histogram"]),
+        rsi=indicators["last_rsi"],
+        adx=indicators["last_adx"],
+        plus_di=indicators["last_plus_di"],
+        minus_di=indicators["last_minus_di"],
+        ema_fast=indicators["last_ema_fast"],
+        ema_slow=indicators["last_ema_slow"],
+        vwap=_safe_val(indicators["last_vwap"]),
+        stoch_k=_safe_val(indicators["last_stoch_k"], 50),
+        engulfing=indicators["engulfing"],
+        pin_bar=indicators["pin_bar"],
+        divergence=indicators["divergence"],
+        macd_divergence=indicators["macd_divergence"],
+        obv_trend_up=get("obv_trend_up", False),
+        cloud_top=get("last_cloud_top"),
+        cloud_bottom=get("last_cloud_bottom"),
+        recent_high=get("recent_high_20"),
+        recent_low=get("recent_low_20"),
+    )
+
+
 def _safe_val(val, default=0):
     """Retourne default si val est None ou NaN."""
-    if val is None:
-        return default
-    if isinstance(val, float) and math.isnan(val):
+    if val is None or val != val:
         return default
     return val
 
 
-def detect_breakout(indicators: dict, direction_bias: str, entry_cfg: dict = None) -> dict | None:
-    cfg = entry_cfg or _DEFAULT_ENTRY_CFG
-    bb_bw = indicators.get("last_bb_bandwidth", 999)
-    vol_ratio = indicators.get("last_volume_ratio", 0)
-    price = indicators.get("last_close", 0)
-    bb_upper = indicators.get("last_bb_upper", 0)
-    bb_lower = indicators.get("last_bb_lower", 0)
+def _breakout_scores(vol_ratio: float, vol_spike: float, conf_bonus: int) -> tuple[int, int]:
+    """(pattern_score, vol_score) d'un breakout, en pur scalaire."""
+    pattern_score = min(30, int((vol_ratio - vol_spike) / vol_spike * 30) + 15) + conf_bonus
+    return min(40, pattern_score), min(20, int(vol_ratio / vol_spike * 10))
+
 
-    squeeze_threshold = cfg["bb_squeeze_threshold"]
-    vol_spike = cfg["volume_spike_ratio"]
+def detect_breakout(snap: IndicatorSnapshot, bias_mask: int, params: EntryParams) -> Setup | None:
+    bb_bw = snap.bb_bandwidth
+    vol_ratio = snap.volume_ratio
+    price = snap.close
+    bb_upper = snap.bb_upper
+    bb_lower = snap.bb_lower
 
-    if bb_bw > squeeze_threshold:
+    vol_spike = params.volume_spike_ratio
+
+    if bb_bw > params.bb_squeeze_threshold:
         return None
     if vol_ratio < vol_spike:
         return None
@@ -43,143 +201,141 @@ def detect_breakout(indicators: dict, direction_bias: str, entry_cfg: dict = Non
     conf_reasons = []
 
     # OBV croissant : confirme le volume derriere le mouvement
-    obv_series = indicators.get("obv")
-    if obv_series is not None and len(obv_series) >= 5:
-        obv_recent = obv_series.tail(5)
-        if obv_recent.iloc[-1] > obv_recent.iloc[0]:
-            confirmations += 1
-            conf_reasons.append("OBV croissant")
+    if snap.obv_trend_up:
+        confirmations += 1
+        conf_reasons.append("OBV croissant")
 
     # MACD positif (long) ou negatif (short)
-    macd_hist = _safe_val(indicators.get("last_macd_histogram"))
-    if direction_bias in ("long", "neutral") and macd_hist > 0:
+    macd_hist = snap.macd_histogram
+    if bias_mask & _ALLOW_LONG and macd_hist > 0:
         confirmations += 1
         conf_reasons.append("MACD+")
-    elif direction_bias in ("short", "neutral") and macd_hist < 0:
+    elif bias_mask & _ALLOW_SHORT and macd_hist < 0:
         confirmations += 1
         conf_reasons.append("MACD-")
 
     # Bonus score pour confirmations
     conf_bonus = confirmations * 5
 
-    # Breakout haussier
-    if price > bb_upper and direction_bias in ("long", "neutral"):
-        pattern_score = min(30, int((vol_ratio - vol_spike) / vol_spike * 30) + 15) + conf_bonus
-        conf_str = f" [{', '.join(conf_reasons)}]" if conf_reasons else ""
-        return {
-            "type": "breakout",
-            "direction": "long",
-            "entry_price": price,
-            "pattern_score": min(40, pattern_score),
-            "vol_score": min(20, int(vol_ratio / vol_spike * 10)),
-            "reason": f"Breakout BB haussier (BW={bb_bw:.3f}%, vol={vol_ratio:.1f}x){conf_str}",
-        }
-
-    # Breakout baissier
-    if price < bb_lower and direction_bias in ("short", "neutral"):
-        pattern_score = min(30, int((vol_ratio - vol_spike) / vol_spike * 30) + 15) + conf_bonus
-        conf_str = f" [{', '.join(conf_reasons)}]" if conf_reasons else ""
-        return {
-            "type": "breakout",
-            "direction": "short",
-            "entry_price": price,
-            "pattern_score": min(40, pattern_score),
-            "vol_score": min(20, int(vol_ratio / vol_spike * 10)),
-            "reason": f"Breakout BB baissier (BW={bb_bw:.3f}%, vol={vol_ratio:.1f}x){conf_str}",
-        }
+    # Breakout haussier (cloture au-dessus de la bande haute) puis baissier (sous la bande basse)
+    for direction, sign, bias_bit, reason_fmt in _BREAKOUT_SIDES:
+        band = bb_upper if sign > 0 else bb_lower
+        if bias_mask & bias_bit and price * sign > band * sign:
+            pattern_score, vol_score = _breakout_scores(vol_ratio, vol_spike, conf_bonus)
+            conf_str = f" [{', '.join(conf_reasons)}]" if conf_reasons else ""
+            return Setup(
+                type="breakout",
+                direction=direction,
+                entry_price=price,
+                pattern_score=pattern_score,
+                vol_score=vol_score,
+                reason_fmt=reason_fmt,
+                reason_args=(bb_bw, vol_ratio, conf_str),
+            )
 
     return None
 
 
-def detect_retest(indicators: dict, df, direction_bias: str, entry_cfg: dict = None) -> dict | None:
-    cfg = entry_cfg or _DEFAULT_ENTRY_CFG
-    if df is None or len(df) < 20:
-        return None
+def _ohlc_arrays(df) -> tuple:
+    """Colonnes open/high/low/close en ndarrays (evite les Series pandas intermediaires)."""
+    return (
+        df["open"].to_numpy(),
+        df["high"].to_numpy(),
+        df["low"].to_numpy(),
+        df["close"].to_numpy(),
+    )
 
-    price = indicators.get("last_close", 0)
-    atr_val = indicators.get("last_atr", 0)
-    buffer = cfg["retest_buffer_pct"] / 100
 
-    highs = df["high"].tail(20)
-    lows = df["low"].tail(20)
-    recent_high = highs.max()
-    recent_low = lows.min()
+def detect_retest(
+    snap: IndicatorSnapshot, ohlc: tuple | None, bias_mask: int, params: EntryParams,
+) -> Setup | None:
+    if ohlc is None or len(ohlc[3]) < 20:
+        return None
+    opens, highs, lows, closes = ohlc
+
+    recent_high = snap.recent_high
+    recent_low = snap.recent_low
+    if recent_high is None or recent_low is None:
+        recent_high = highs[-20:].max()
+        recent_low = lows[-20:].min()
+
+    last_candle = (opens[-1].item(), highs[-1].item(), lows[-1].item(), closes[-1].item())
+    return detect_retest_at_levels(snap, last_candle, recent_high, recent_low, bias_mask, params)
+
+
+def detect_retest_at_levels(
+    snap: IndicatorSnapshot,
+    last_candle: tuple,
+    recent_high: float,
+    recent_low: float,
+    bias_mask: int,
+    params: EntryParams,
+) -> Setup | None:
+    """
+    Retest sur des extremes 20 bougies deja connus.
+    Permet a un appelant qui maintient ses propres extremes glissants d'eviter la reduction sur l'historique.
+    last_candle: (open, high, low, close) de la derniere bougie.
+    """
+    price = snap.close
+    buffer = params.retest_buffer
+    wick_ratio = params.rejection_wick_ratio
 
-    candle = df.iloc[-1]
-    body = abs(candle["close"] - candle["open"])
-    total_range = candle["high"] - candle["low"]
+    c_open, c_high, c_low, c_close = last_candle
+    body = abs(c_close - c_open)
+    total_range = c_high - c_low
     if total_range == 0:
         return None
 
-    # VWAP proximity check (S/R dynamique)
-    vwap = _safe_val(indicators.get("last_vwap"), 0)
-    vwap_bonus = 0
-    vwap_confirmation = ""
-    if vwap > 0 and price > 0:
-        vwap_distance_pct = abs(price - vwap) / vwap * 100
-        if vwap_distance_pct <= 0.2:
-            vwap_bonus = 5
-            vwap_confirmation = " + VWAP S/R"
-
-    # Confirmation Stoch RSI
-    stoch_k = _safe_val(indicators.get("last_stoch_k"), 50)
-    stoch_confirmation = ""
-    stoch_bonus = 0
-
-    # Retest support (bullish)
-    if direction_bias in ("long", "neutral"):
-        support_zone = recent_low * (1 + buffer)
-        if price <= support_zone and price > recent_low:
-            lower_wick = min(candle["open"], candle["close"]) - candle["low"]
-            if lower_wick > body * cfg["rejection_wick_ratio"]:
-                # Stoch RSI oversold = confirmation forte
-                if stoch_k < 20:
-                    stoch_bonus = 8
-                    stoch_confirmation = " + Stoch RSI oversold"
-                elif stoch_k < 35:
-                    stoch_bonus = 4
-                    stoch_confirmation = " + Stoch RSI bas"
-
-                return {
-                    "type": "retest",
-                    "direction": "long",
-                    "entry_price": price,
-                    "pattern_score": 20 + stoch_bonus + vwap_bonus,
-                    "vol_score": min(20, int(indicators.get("last_volume_ratio", 0) * 10)),
-                    "reason": f"Retest support {recent_low:.6f} avec rejection{stoch_confirmation}{vwap_confirmation}",
-                    "key_level": recent_low,
-                }
-
-    # Retest resistance (bearish)
-    if direction_bias in ("short", "neutral"):
-        resistance_zone = recent_high * (1 - buffer)
-        if price >= resistance_zone and price < recent_high:
-            upper_wick = candle["high"] - max(candle["open"], candle["close"])
-            if upper_wick > body * cfg["rejection_wick_ratio"]:
-                # Stoch RSI overbought = confirmation forte
-                if stoch_k > 80:
+    # Retest support (bullish) puis resistance (bearish) : niveau touche sans cloturer au-dela,
+    # avec une meche de rejet du cote du niveau. Les confirmations (Stoch RSI, VWAP) ne sont
+    # evaluees qu'une fois le setup valide.
+    for direction, sign, bias_bit, stoch_strong, stoch_mild, strong_label, mild_label, reason_fmt in _RETEST_SIDES:
+        if not bias_mask & bias_bit:
+            continue
+        level = recent_low if sign > 0 else recent_high
+        zone = level * (1 + sign * buffer)
+        if price * sign <= zone * sign and price * sign > level * sign:
+            wick = min(c_open, c_close) - c_low if sign > 0 else c_high - max(c_open, c_close)
+            if wick > body * wick_ratio:
+                # Stoch RSI oversold (long) / overbought (short) = confirmation forte
+                stoch_k = snap.stoch_k
+                if stoch_k * sign < stoch_strong * sign:
                     stoch_bonus = 8
-                    stoch_confirmation = " + Stoch RSI overbought"
-                elif stoch_k > 65:
+                    stoch_confirmation = strong_label
+                elif stoch_k * sign < stoch_mild * sign:
                     stoch_bonus = 4
-                    stoch_confirmation = " + Stoch RSI haut"
-
-                return {
-                    "type": "retest",
-                    "direction": "short",
-                    "entry_price": price,
-                    "pattern_score": 20 + stoch_bonus + vwap_bonus,
-                    "vol_score": min(20, int(indicators.get("last_volume_ratio", 0) * 10)),
-                    "reason": f"Retest resistance {recent_high:.6f} avec rejection{stoch_confirmation}{vwap_confirmation}",
-                    "key_level": recent_high,
-                }
+                    stoch_confirmation = mild_label
+                else:
+                    stoch_bonus = 0
+                    stoch_confirmation = ""
+
+                # VWAP proximity check (S/R dynamique)
+                vwap = snap.vwap
+                vwap_bonus = 0
+                vwap_confirmation = ""
+                if vwap > 0 and price > 0:
+                    vwap_distance_pct = abs(price - vwap) / vwap * 100
+                    if vwap_distance_pct <= 0.2:
+                        vwap_bonus = 5
+                        vwap_confirmation = " + VWAP S/R"
+
+                return Setup(
+                    type="retest",
+                    direction=direction,
+                    entry_price=price,
+                    pattern_score=20 + stoch_bonus + vwap_bonus,
+                    vol_score=snap.vol_score,
+                    reason_fmt=reason_fmt,
+                    reason_args=(level, stoch_confirmation, vwap_confirmation),
+                    key_level=level,
+                )
 
     return None
 
 
-def detect_divergence_setup(indicators: dict, direction_bias: str) -> dict | None:
-    div = indicators.get("divergence", "none")
-    macd_div = indicators.get("macd_divergence", "none")
+def detect_divergence_setup(snap: IndicatorSnapshot, bias_mask: int) -> Setup | None:
+    div = snap.divergence
+    macd_div = snap.macd_divergence
 
     # Double divergence (RSI + MACD) = plus forte
     both = div != "none" and macd_div == div
@@ -189,48 +345,62 @@ def detect_divergence_setup(indicators: dict, direction_bias: str) -> dict | Non
     # Utiliser la divergence RSI ou MACD
     effective_div = div if div != "none" else macd_div
 
-    if effective_div == "bullish" and direction_bias in ("long", "neutral"):
-        return {
-            "type": "divergence",
-            "direction": "long",
-            "entry_price": indicators.get("last_close", 0),
-            "pattern_score": 22 + bonus,
-            "vol_score": 10,
-            "reason": f"Divergence haussiere {div_label} (prix lower low, indicateur higher low)",
-        }
-    elif effective_div == "bearish" and direction_bias in ("short", "neutral"):
-        return {
-            "type": "divergence",
-            "direction": "short",
-            "entry_price": indicators.get("last_close", 0),
-            "pattern_score": 22 + bonus,
-            "vol_score": 10,
-            "reason": f"Divergence baissiere {div_label} (prix higher high, indicateur lower high)",
-        }
+    if effective_div == "bullish" and bias_mask & _ALLOW_LONG:
+        return Setup(
+            type="divergence",
+            direction="long",
+            entry_price=snap.close,
+            pattern_score=22 + bonus,
+            vol_score=10,
+            reason_fmt=_REASON_DIVERGENCE_LONG,
+            reason_args=(div_label,),
+        )
+    elif effective_div == "bearish" and bias_mask & _ALLOW_SHORT:
+        return Setup(
+            type="divergence",
+            direction="short",
+            entry_price=snap.close,
+            pattern_score=22 + bonus,
+            vol_score=10,
+            reason_fmt=_REASON_DIVERGENCE_SHORT,
+            reason_args=(div_label,),
+        )
 
     return None
 
 
-def detect_ema_bounce(indicators: dict, direction_bias: str, entry_cfg: dict = None) -> dict | None:
-    cfg = entry_cfg or _DEFAULT_ENTRY_CFG
-    price = indicators.get("last_close", 0)
-    ema20 = indicators.get("last_ema_fast", 0)
-    ema50 = indicators.get("last_ema_slow", 0)
+def detect_ema_bounce(
+    snap: IndicatorSnapshot, bias_mask: int, params: EntryParams,
+) -> Setup | None:
+    price = snap.close
+    ema20 = snap.ema_fast
+    ema50 = snap.ema_slow
 
     if ema20 == 0 or price == 0:
         return None
 
-    proximity_pct = cfg["ema_bounce_proximity_pct"]
-    distance_pct = abs(price - ema20) / ema20 * 100
+    # Le bounce exige un biais directionnel franc : neutre -> aucun setup
+    side = _EMA_BOUNCE_SIDES.get(bias_mask)
+    if side is None:
+        return None
+    direction, sign, pattern, cloud_label, reason_fmt = side
 
-    if distance_pct > proximity_pct:
+    # Filtre de proximite sans division ; distance_pct n'est calcule que pour la raison
+    distance = abs(price - ema20)
+    if distance > ema20 * params.ema_bounce_proximity:
         return None
 
-    engulfing = indicators.get("engulfing", "none")
-    pin_bar = indicators.get("pin_bar", "none")
+    # Bounce dans le sens de la tendance EMA20/EMA50, confirme par engulfing ou pin bar ;
+    # garde decisive avant les confirmations VWAP/Ichimoku
+    if not ema20 * sign > ema50 * sign:
+        return None
+    engulfing = snap.engulfing
+    if engulfing != pattern and snap.pin_bar != pattern:
+        return None
+    signal_type = "engulfing" if engulfing == pattern else "pin bar"
 
     # VWAP proximity bonus for EMA bounce
-    vwap = _safe_val(indicators.get("last_vwap"), 0)
+    vwap = snap.vwap
     vwap_ema_bonus = 0
     vwap_ema_confirmation = ""
     if vwap > 0 and price > 0:
@@ -239,53 +409,26 @@ def detect_ema_bounce(indicators: dict, direction_bias: str, entry_cfg: dict = N
             vwap_ema_bonus = 3
             vwap_ema_confirmation = " + VWAP proche"
 
-    # Confirmation Ichimoku Cloud
-    ichimoku = indicators.get("ichimoku")
+    # Confirmation Ichimoku Cloud : prix au-dessus du nuage (long) / en dessous (short)
+    cloud_top = snap.cloud_top
     cloud_confirmation = ""
     cloud_bonus = 0
-    if ichimoku is not None:
-        senkou_a = ichimoku.get("senkou_a")
-        senkou_b = ichimoku.get("senkou_b")
-        if senkou_a is not None and senkou_b is not None:
-            last_a = _safe_val(senkou_a.iloc[-1] if len(senkou_a) > 0 else None)
-            last_b = _safe_val(senkou_b.iloc[-1] if len(senkou_b) > 0 else None)
-            if last_a and last_b:
-                cloud_top = max(last_a, last_b)
-                cloud_bottom = min(last_a, last_b)
-                if direction_bias == "long" and price > cloud_top:
-                    cloud_bonus = 5
-                    cloud_confirmation = " + au-dessus Ichimoku"
-                elif direction_bias == "short" and price < cloud_bottom:
-                    cloud_bonus = 5
-                    cloud_confirmation = " + sous Ichimoku"
-
-    # Bounce haussier
-    if direction_bias == "long" and ema20 > ema50:
-        if engulfing == "bullish" or pin_bar == "bullish":
-            signal_type = "engulfing" if engulfing == "bullish" else "pin bar"
-            return {
-                "type": "ema_bounce",
-                "direction": "long",
-                "entry_price": price,
-                "pattern_score": 25 + cloud_bonus + vwap_ema_bonus,
-                "vol_score": min(20, int(indicators.get("last_volume_ratio", 0) * 10)),
-                "reason": f"Bounce EMA20 haussier ({signal_type}, dist={distance_pct:.3f}%){cloud_confirmation}{vwap_ema_confirmation}",
-            }
-
-    # Bounce baissier
-    if direction_bias == "short" and ema20 < ema50:
-        if engulfing == "bearish" or pin_bar == "bearish":
-            signal_type = "engulfing" if engulfing == "bearish" else "pin bar"
-            return {
-                "type": "ema_bounce",
-                "direction": "short",
-                "entry_price": price,
-                "pattern_score": 25 + cloud_bonus + vwap_ema_bonus,
-                "vol_score": min(20, int(indicators.get("last_volume_ratio", 0) * 10)),
-                "reason": f"Bounce EMA20 baissier ({signal_type}, dist={distance_pct:.3f}%){cloud_confirmation}{vwap_ema_confirmation}",
-            }
-
-    return None
+    if cloud_top is not None:
+        cloud_level = cloud_top if sign > 0 else snap.cloud_bottom
+        if price * sign > cloud_level * sign:
+            cloud_bonus = 5
+            cloud_confirmation = cloud_label
+
+    distance_pct = distance / ema20 * 100
+    return Setup(
+        type="ema_bounce",
+        direction=direction,
+        entry_price=price,
+        pattern_score=25 + cloud_bonus + vwap_ema_bonus,
+        vol_score=snap.vol_score,
+        reason_fmt=reason_fmt,
+        reason_args=(signal_type, distance_pct, cloud_confirmation, vwap_ema_confirmation),
+    )
 
 
 def calculate_rr_score(entry: float, stop: float, tp1: float) -> int:
@@ -303,17 +446,17 @@ def calculate_rr_score(entry: float, stop: float, tp1: float) -> int:
         return 0
 
 
-def detect_momentum(indicators: dict, direction_bias: str) -> dict | None:
+def detect_momentum(snap: IndicatorSnapshot, bias_mask: int) -> Setup | None:
     """Detecte un momentum fort (tendance claire sans bounce ni retest)."""
-    price = indicators.get("last_close", 0)
-    rsi = indicators.get("last_rsi", 50)
-    adx = indicators.get("last_adx", 0)
-    di_plus = indicators.get("last_plus_di", 0)
-    di_minus = indicators.get("last_minus_di", 0)
-    ema20 = indicators.get("last_ema_fast", 0)
-    ema50 = indicators.get("last_ema_slow", 0)
-    macd_hist = indicators.get("last_macd_histogram", 0)
-    vol_ratio = indicators.get("volume_ratio", 1.0)
+    price = snap.close
+    rsi = snap.rsi
+    adx = snap.adx
+    di_plus = snap.plus_di
+    di_minus = snap.minus_di
+    ema20 = snap.ema_fast
+    ema50 = snap.ema_slow
+    macd_hist = snap.macd_histogram
+    vol_ratio = snap.volume_ratio
 
     if not price or adx < 20:
         return None
@@ -322,47 +465,78 @@ def detect_momentum(indicators: dict, direction_bias: str) -> dict | None:
     vol_score = min(20, int(max(0, (vol_ratio - 0.5)) * 20))
 
     # SHORT momentum: RSI < 35, DI- > DI+, prix sous EMA20 et EMA50
-    if direction_bias in ("short", "neutral"):
-        if rsi < 35 and di_minus > di_plus and price < ema20 and price < ema50:
-            score = 15
-            if rsi < 25:
-                score += 5
-            if adx > 40:
-                score += 5
-            if macd_hist < 0:
-                score += 5
-            return {
-                "type": "momentum",
-                "direction": "short",
-                "entry_price": price,
-                "pattern_score": score,
-                "vol_score": vol_score,
-                "reason": f"Momentum baissier fort (RSI {rsi:.1f}, ADX {adx:.1f})",
-            }
-
     # LONG momentum: RSI > 65, DI+ > DI-, prix au-dessus EMA20 et EMA50
-    if direction_bias in ("long", "neutral"):
-        if rsi > 65 and di_plus > di_minus and price > ema20 and price > ema50:
+    for direction, sign, bias_bit, rsi_thr, rsi_strong, reason_fmt in _MOMENTUM_SIDES:
+        if not bias_mask & bias_bit:
+            continue
+        signed_price = price * sign
+        if (
+            rsi * sign > rsi_thr * sign
+            and di_plus * sign > di_minus * sign
+            and signed_price > ema20 * sign
+            and signed_price > ema50 * sign
+        ):
             score = 15
-            if rsi > 75:
+            if rsi * sign > rsi_strong * sign:
                 score += 5
             if adx > 40:
                 score += 5
-            if macd_hist > 0:
+            if macd_hist * sign > 0:
                 score += 5
-            return {
-                "type": "momentum",
-                "direction": "long",
-                "entry_price": price,
-                "pattern_score": score,
-                "vol_score": vol_score,
-                "reason": f"Momentum haussier fort (RSI {rsi:.1f}, ADX {adx:.1f})",
-            }
+            return Setup(
+                type="momentum",
+                direction=direction,
+                entry_price=price,
+                pattern_score=score,
+                vol_score=vol_score,
+                reason_fmt=reason_fmt,
+                reason_args=(rsi, adx),
+            )
 
     return None
 
 
-def candle_confirmation(entry: dict, indicators: dict, df) -> dict:
+@dataclass(frozen=True, slots=True)
+class _CandleSide:
+    """Patterns et libelles d'un sens de trade pour candle_confirmation."""
+    own: str  # pattern dans le sens du trade ("bullish" pour long)
+    opposite: str
+    reject_key: str  # cle candle_context de la grosse bougie contraire
+    reject_reason: str
+    last_reason: str
+    second_pattern: str  # pattern de confirmation hors engulfing
+    confirm_label: str
+    contra_reason: str
+    consec_label: str
+
+
+_CANDLE_SIDES = {
+    "long": _CandleSide(
+        own="bullish",
+        opposite="bearish",
+        reject_key="big_candle_resistance",
+        reject_reason="Grosse bougie rouge = resistance au niveau actuel",
+        last_reason="derniere bougie fortement baissiere",
+        second_pattern="hammer",
+        confirm_label="haussier confirme",
+        contra_reason="shooting star bearish contredit LONG",
+        consec_label="baissières",
+    ),
+    "short": _CandleSide(
+        own="bearish",
+        opposite="bullish",
+        reject_key="big_candle_support",
+        reject_reason="Grosse bougie verte = support au niveau actuel",
+        last_reason="derniere bougie fortement haussiere",
+        second_pattern="shooting star",
+        confirm_label="baissier confirme",
+        contra_reason="hammer bullish contredit SHORT",
+        consec_label="haussières",
+    ),
+}
+
+
+def candle_confirmation(entry: Setup, indicators: dict, df) -> dict:
     """
     Verifie si les bougies confirment ou contredisent le signal d'entree.
     Retourne: {"confirmed": bool, "score_modifier": int, "reason": str}
@@ -371,7 +545,7 @@ def candle_confirmation(entry: dict, indicators: dict, df) -> dict:
     - Malus -5 a -15 si contradiction
     - Rejet (confirmed=False) si grosse bougie resistance au meme niveau
     """
-    direction = entry.get("direction", "")
+    side = _CANDLE_SIDES[entry.direction]
     modifier = 0
     reasons = []
 
@@ -382,56 +556,40 @@ def candle_confirmation(entry: dict, indicators: dict, df) -> dict:
     shooting_star = indicators.get("shooting_star", "none")
 
     # --- 1. Check anti-resistance (rejet possible) ---
-    if direction == "long" and candle_ctx.get("big_candle_resistance"):
-        return {
-            "confirmed": False,
-            "score_modifier": 0,
-            "reason": "Grosse bougie rouge = resistance au niveau actuel",
-        }
-    if direction == "short" and candle_ctx.get("big_candle_support"):
+    if candle_ctx.get(side.reject_key):
         return {
             "confirmed": False,
             "score_modifier": 0,
-            "reason": "Grosse bougie verte = support au niveau actuel",
+            "reason": side.reject_reason,
         }
 
     # --- 2. Check derniere bougie (malus) ---
     last_dir = candle_ctx.get("last_candle_direction", "neutral")
-    if direction == "long" and last_dir == "bearish":
-        # Derniere bougie rouge avec corps significatif
+    if last_dir == side.opposite:
+        last_body_ratio = 0.0
         if df is not None and len(df) >= 1:
-            c = df.iloc[-1]
-            rng = c["high"] - c["low"]
-            body = abs(c["close"] - c["open"])
-            if rng > 0 and body / rng > 0.60:
-                modifier -= 10
-                reasons.append("derniere bougie fortement baissiere")
-    if direction == "short" and last_dir == "bullish":
-        if df is not None and len(df) >= 1:
-            c = df.iloc[-1]
-            rng = c["high"] - c["low"]
-            body = abs(c["close"] - c["open"])
-            if rng > 0 and body / rng > 0.60:
-                modifier -= 10
-                reasons.append("derniere bougie fortement haussiere")
+            c_open, c_high, c_low, c_close = (df[col].to_numpy()[-1].item() for col in ("open", "high", "low", "close"))
+            rng = c_high - c_low
+            if rng > 0:
+                last_body_ratio = abs(c_close - c_open) / rng
+        # Derniere bougie contraire avec corps significatif
+        if last_body_ratio > 0.60:
+            modifier -= 10
+            reasons.append(side.last_reason)
 
     # --- 3. Check patterns (bonus/malus equilibre) ---
-    if direction == "long":
-        if engulfing == "bullish" or hammer == "bullish":
-            modifier += 15
-            pat = "engulfing" if engulfing == "bullish" else "hammer"
-            reasons.append(f"{pat} haussier confirme")
-        if shooting_star == "bearish":
-            modifier -= 10
-            reasons.append("shooting star bearish contredit LONG")
-    elif direction == "short":
-        if engulfing == "bearish" or shooting_star == "bearish":
-            modifier += 15
-            pat = "engulfing" if engulfing == "bearish" else "shooting star"
-            reasons.append(f"{pat} baissier confirme")
-        if hammer == "bullish":
-            modifier -= 10
-            reasons.append("hammer bullish contredit SHORT")
+    # long : hammer confirme, shooting star contredit ; short : l'inverse
+    if side.own == "bullish":
+        second, contra = hammer, shooting_star
+    else:
+        second, contra = shooting_star, hammer
+    if engulfing == side.own or second == side.own:
+        modifier += 15
+        pat = "engulfing" if engulfing == side.own else side.second_pattern
+        reasons.append(f"{pat} {side.confirm_label}")
+    if contra == side.opposite:
+        modifier -= 10
+        reasons.append(side.contra_reason)
 
     # Doji = indecision (leger malus)
     if doji != "none":
@@ -441,13 +599,9 @@ def candle_confirmation(entry: dict, indicators: dict, df) -> dict:
     # --- 4. Bougies consecutives opposees (malus) ---
     consecutive = candle_ctx.get("consecutive_direction", 0)
     consec_dir = candle_ctx.get("last_candle_direction", "neutral")
-    if consecutive >= 3:
-        if direction == "long" and consec_dir == "bearish":
-            modifier -= 8
-            reasons.append(f"{consecutive} bougies baissières consecutives")
-        elif direction == "short" and consec_dir == "bullish":
-            modifier -= 8
-            reasons.append(f"{consecutive} bougies haussières consecutives")
+    if consecutive >= 3 and consec_dir == side.opposite:
+        modifier -= 8
+        reasons.append(f"{consecutive} bougies {side.consec_label} consecutives")
 
     reason_str = "; ".join(reasons) if reasons else "bougies neutres"
     return {
@@ -457,14 +611,21 @@ def candle_confirmation(entry: dict, indicators: dict, df) -> dict:
     }
 
 
-def calculate_confluence(setups: list[dict]) -> int:
-    if len(setups) >= 3:
-        return 25
-    elif len(setups) == 2:
-        return 15
-    elif len(setups) == 1:
-        return 5
-    return 0
+# Bonus de confluence selon le nombre de setups detectes (3+ plafonne a 25)
+_CONFLUENCE_SCORES = (0, 5, 15, 25)
+
+
+def calculate_confluence(n_setups: int) -> int:
+    return _CONFLUENCE_SCORES[min(n_setups, 3)]
+
+
+_SETUP_ORDER = ("breakout", "retest", "divergence", "ema_bounce", "momentum")
+
+
+@lru_cache(maxsize=64)
+def _enabled_setups(allowed_setups: tuple[str, ...]) -> tuple[bool, ...]:
+    """Drapeaux par detecteur (ordre _SETUP_ORDER), resolus une fois par combinaison de setups."""
+    return tuple(name in allowed_setups for name in _SETUP_ORDER)
 
 
 def find_best_entry(
@@ -473,40 +634,37 @@ def find_best_entry(
     direction_bias: str,
     allowed_setups: list[str],
     entry_cfg: dict = None,
-) -> dict | None:
-    cfg = entry_cfg or _DEFAULT_ENTRY_CFG
-    setups = []
-
-    if "breakout" in allowed_setups:
-        s = detect_breakout(indicators, direction_bias, entry_cfg=cfg)
-        if s:
-            setups.append(s)
-
-    if "retest" in allowed_setups:
-        s = detect_retest(indicators, df, direction_bias, entry_cfg=cfg)
-        if s:
-            setups.append(s)
-
-    if "divergence" in allowed_setups:
-        s = detect_divergence_setup(indicators, direction_bias)
-        if s:
-            setups.append(s)
-
-    if "ema_bounce" in allowed_setups:
-        s = detect_ema_bounce(indicators, direction_bias, entry_cfg=cfg)
-        if s:
-            setups.append(s)
-
-    if "momentum" in allowed_setups:
-        s = detect_momentum(indicators, direction_bias)
-        if s:
-            setups.append(s)
-
-    if not setups:
+) -> Setup | None:
+    params = _entry_params(entry_cfg or _DEFAULT_ENTRY_CFG)
+    bias_mask = _BIAS_MASKS.get(direction_bias, 0)
+    snap = _unpack_indicators(indicators)
+    ohlc = _ohlc_arrays(df) if df is not None else None
+
+    use_breakout, use_retest, use_divergence, use_ema_bounce, use_momentum = _enabled_setups(tuple(allowed_setups))
+    found = (
+        detect_breakout(snap, bias_mask, params) if use_breakout else None,
+        detect_retest(snap, ohlc, bias_mask, params) if use_retest else None,
+        detect_divergence_setup(snap, bias_mask) if use_divergence else None,
+        detect_ema_bounce(snap, bias_mask, params) if use_ema_bounce else None,
+        detect_momentum(snap, bias_mask) if use_momentum else None,
+    )
+
+    best = None
+    best_score = 0
+    types = []
+    for s in found:
+        if s is None:
+            continue
+        types.append(s.type)
+        score = s.pattern_score + s.vol_score
+        if best is None or score > best_score:
+            best = s
+            best_score = score
+
+    if best is None:
         return None
 
-    best = max(setups, key=lambda x: x["pattern_score"] + x["vol_score"])
-    best["confluence_score"] = calculate_confluence(setups)
-    best["all_setups"] = [s["type"] for s in setups]
+    best.confluence_score = calculate_confluence(len(types))
+    best.all_setups = tuple(types)
 
     return best
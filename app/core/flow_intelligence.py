@@ -119,7 +119,7 @@ class FlowIntelligence:
                         "ts": now_iso,
                     }
         except Exception as e:
-            logger.debug(f"FlowIntel global L/S {bsym}: {e}")
+            logger.debug("FlowIntel global L/S %s: %s", bsym, e)
 
         # 2. Top Traders L/S (account — smart money)
         try:
@@ -136,7 +136,7 @@ class FlowIntelligence:
                         "ts": now_iso,
                     }
         except Exception as e:
-            logger.debug(f"FlowIntel top traders L/S {bsym}: {e}")
+            logger.debug("FlowIntel top traders L/S %s: %s", bsym, e)
 
         # 3. Top Traders L/S (position — big money direction)
         try:
@@ -153,7 +153,7 @@ class FlowIntelligence:
                         "ts": now_iso,
                     }
         except Exception as e:
-            logger.debug(f"FlowIntel top pos L/S {bsym}: {e}")
+            logger.debug("FlowIntel top pos L/S %s: %s", bsym, e)
 
         # 4. Taker Buy/Sell Volume Ratio
         try:
@@ -179,7 +179,7 @@ class FlowIntelligence:
                         "ts": now_iso,
                     }
         except Exception as e:
-            logger.debug(f"FlowIntel taker volume {bsym}: {e}")
+            logger.debug("FlowIntel taker volume %s: %s", bsym, e)
 
         # 5. Open Interest (current + recent history for divergence)
         try:
@@ -199,7 +199,7 @@ class FlowIntelligence:
                         "ts": now_iso,
                     }
         except Exception as e:
-            logger.debug(f"FlowIntel OI {bsym}: {e}")
+            logger.debug("FlowIntel OI %s: %s", bsym, e)
 
         # 6. Spot vs Futures Basis
         try:
@@ -219,7 +219,7 @@ class FlowIntelligence:
                         "ts": now_iso,
                     }
         except Exception as e:
-            logger.debug(f"FlowIntel basis {bsym}: {e}")
+            logger.debug("FlowIntel basis %s: %s", bsym, e)
 
     # =============================
     # Background: Liquidation WS
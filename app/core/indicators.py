@@ -1,9 +1,10 @@
 import pandas as pd
 import numpy as np
 from dataclasses import dataclass
+from numpy.lib.stride_tricks import sliding_window_view
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class MarketStructure:
     trend: str  # "bullish", "bearish", "neutral"
     higher_highs: bool
@@ -12,110 +13,294 @@ class MarketStructure:
     lower_lows: bool
 
 
+# Immuable : une seule instance partagee pour le cas "pas de structure"
+_NEUTRAL_STRUCTURE = MarketStructure("neutral", False, False, False, False)
+
+
+def _ema(values: np.ndarray, period: int) -> np.ndarray:
+    """
+    EMA (adjust=False, amorcee sur la premiere valeur) par recurrence directe sur le tableau,
+    sans construire d'objet ewm. Les NaN sont laisses a pandas, qui gere leur ponderation.
+    """
+    if np.isnan(values).any():
+        return pd.Series(values).ewm(span=period, adjust=False).mean().to_numpy()
+    alpha = 2 / (period + 1)
+    x = values.tolist()
+    out = np.empty(len(x))
+    if x:
+        y = x[0]
+        out[0] = y
+        for i in range(1, len(x)):
+            y += alpha * (x[i] - y)
+            out[i] = y
+    return out
+
+
 def ema(series: pd.Series, period: int) -> pd.Series:
-    return series.ewm(span=period, adjust=False).mean()
+    return pd.Series(_ema(series.to_numpy(dtype=np.float64), period), index=series.index)
 
 
 def sma(series: pd.Series, period: int) -> pd.Series:
     return series.rolling(window=period).mean()
 
 
+def _rsi_wilder(closes: np.ndarray, period: int) -> np.ndarray:
+    """
+    RSI en une seule passe : delta, gain/perte et moyennes de Wilder avancees ensemble.
+    Reproduit ewm(com=period-1, adjust=True, min_periods=period) : les deux moyennes
+    partagent la meme somme de poids, RS se reduit donc au rapport des sommes ponderees.
+    """
+    c = closes.tolist()
+    n = len(c)
+    out = np.full(n, np.nan)
+    decay = 1 - 1 / period
+    sum_gain = sum_loss = 0.0
+    for i in range(1, n):
+        d = c[i] - c[i - 1]
+        sum_gain *= decay
+        sum_loss *= decay
+        if d > 0:
+            sum_gain += d
+        elif d < 0:
+            sum_loss -= d
+        if i >= period - 1 and sum_loss != 0:
+            out[i] = 100 - (100 / (1 + sum_gain / sum_loss))
+    return out
+
+
 def rsi(series: pd.Series, period: int = 14) -> pd.Series:
-    delta = series.diff()
-    gain = delta.where(delta > 0, 0.0)
-    loss = -delta.where(delta < 0, 0.0)
-    avg_gain = gain.ewm(com=period - 1, min_periods=period).mean()
-    avg_loss = loss.ewm(com=period - 1, min_periods=period).mean()
-    rs = avg_gain / avg_loss.replace(0, np.nan)
-    return 100 - (100 / (1 + rs))
+    return pd.Series(_rsi_wilder(series.to_numpy(dtype=np.float64), period), index=series.index)
 
 
-def atr(df: pd.DataFrame, period: int = 14) -> pd.Series:
-    high = df["high"]
-    low = df["low"]
-    close = df["close"]
-    tr1 = high - low
-    tr2 = (high - close.shift()).abs()
-    tr3 = (low - close.shift()).abs()
-    tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-    return tr.rolling(window=period).mean()
+def _rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Moyenne glissante (NaN tant que la fenetre est incomplete), comme rolling(window).mean()."""
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        out[window - 1:] = sliding_window_view(values, window).mean(axis=1)
+    return out
 
 
-def bollinger_bands(series: pd.Series, period: int = 20, std: float = 2.0) -> dict:
-    middle = sma(series, period)
-    std_dev = series.rolling(window=period).std()
+def _rolling_max(values: np.ndarray, window: int) -> np.ndarray:
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        out[window - 1:] = sliding_window_view(values, window).max(axis=1)
+    return out
+
+
+def _rolling_min(values: np.ndarray, window: int) -> np.ndarray:
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        out[window - 1:] = sliding_window_view(values, window).min(axis=1)
+    return out
+
+
+def _shift(values: np.ndarray, periods: int) -> np.ndarray:
+    """Decalage facon Series.shift(periods) : positif = vers le futur, trous remplis de NaN."""
+    out = np.full(len(values), np.nan)
+    if periods >= 0:
+        if periods < len(values):
+            out[periods:] = values[:len(values) - periods]
+    elif -periods < len(values):
+        out[:periods] = values[-periods:]
+    return out
+
+
+def _true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    """True range ; la premiere bougie (sans cloture precedente) vaut high - low."""
+    prev_close = np.empty_like(close)
+    prev_close[:1] = np.nan
+    prev_close[1:] = close[:-1]
+    # fmax ignore les NaN comme max(axis=1) de pandas
+    return np.fmax(np.fmax(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
+
+
+def atr(df: pd.DataFrame, period: int = 14) -> pd.Series:
+    tr = _true_range(
+        df["high"].to_numpy(dtype=np.float64),
+        df["low"].to_numpy(dtype=np.float64),
+        df["close"].to_numpy(dtype=np.float64),
+    )
+    return pd.Series(_rolling_mean(tr, period), index=df.index)
+
+
+def _bollinger(values: np.ndarray, period: int, std: float) -> tuple:
+    """(upper, middle, lower, bandwidth) en ndarrays."""
+    # Moyenne et ecart-type (ddof=1, comme rolling.std) sur une seule vue des fenetres glissantes
+    middle = np.full(len(values), np.nan)
+    std_dev = np.full(len(values), np.nan)
+    if len(values) >= period:
+        windows = sliding_window_view(values, period)
+        middle[period - 1:] = windows.mean(axis=1)
+        std_dev[period - 1:] = windows.std(axis=1, ddof=1)
+        # Fenetre (quasi) plate, paires illiquides : l'ecart-type n'est que du bruit d'arrondi, et celui
+        # des sommes glissantes pandas differe de celui de NumPy ; on reprend alors le calcul pandas d'origine.
+        if np.any(std_dev[period - 1:] <= 1e-6 * np.abs(middle[period - 1:])):
+            rolling = pd.Series(values).rolling(window=period)
+            middle = rolling.mean().to_numpy()
+            std_dev = rolling.std().to_numpy()
     upper = middle + std * std_dev
     lower = middle - std * std_dev
     bandwidth = ((upper - lower) / middle) * 100
+    return upper, middle, lower, bandwidth
+
+
+def bollinger_bands(series: pd.Series, period: int = 20, std: float = 2.0) -> dict:
+    upper, middle, lower, bandwidth = _bollinger(series.to_numpy(dtype=np.float64), period, std)
+    index = series.index
     return {
-        "upper": upper,
-        "middle": middle,
-        "lower": lower,
-        "bandwidth": bandwidth,
+        "upper": pd.Series(upper, index=index),
+        "middle": pd.Series(middle, index=index),
+        "lower": pd.Series(lower, index=index),
+        "bandwidth": pd.Series(bandwidth, index=index),
     }
 
 
+def _macd(close: np.ndarray, fast: int, slow: int, signal: int) -> tuple:
+    """
+    (macd, signal, histogram) en ndarrays : les trois EMA (adjust=False) avancent dans
+    la meme boucle. Les NaN sont laisses au chemin pandas, qui gere leur ponderation.
+    """
+    if np.isnan(close).any():
+        series = pd.Series(close)
+        macd_line = ema(series, fast) - ema(series, slow)
+        signal_line = ema(macd_line, signal)
+        return macd_line.to_numpy(), signal_line.to_numpy(), (macd_line - signal_line).to_numpy()
+
+    a_fast = 2 / (fast + 1)
+    a_slow = 2 / (slow + 1)
+    a_signal = 2 / (signal + 1)
+    c = close.tolist()
+    n = len(c)
+    macd_line = np.empty(n)
+    signal_line = np.empty(n)
+    if n:
+        ema_f = ema_s = c[0]
+        sig = 0.0
+        macd_line[0] = signal_line[0] = 0.0
+        for i in range(1, n):
+            x = c[i]
+            ema_f += a_fast * (x - ema_f)
+            ema_s += a_slow * (x - ema_s)
+            m = ema_f - ema_s
+            sig += a_signal * (m - sig)
+            macd_line[i] = m
+            signal_line[i] = sig
+    return macd_line, signal_line, macd_line - signal_line
+
+
 def macd(series: pd.Series, fast: int = 12, slow: int = 26, signal: int = 9) -> dict:
-    ema_fast = ema(series, fast)
-    ema_slow_val = ema(series, slow)
-    macd_line = ema_fast - ema_slow_val
-    signal_line = ema(macd_line, signal)
-    histogram = macd_line - signal_line
-    return {"macd": macd_line, "signal": signal_line, "histogram": histogram}
+    macd_line, signal_line, histogram = _macd(series.to_numpy(dtype=np.float64), fast, slow, signal)
+    index = series.index
+    return {
+        "macd": pd.Series(macd_line, index=index),
+        "signal": pd.Series(signal_line, index=index),
+        "histogram": pd.Series(histogram, index=index),
+    }
 
 
-def stoch_rsi(series: pd.Series, period: int = 14, k: int = 3, d: int = 3) -> dict:
-    rsi_values = rsi(series, period)
+def _stoch_rsi(rsi_values: np.ndarray, period: int, k: int, d: int, closes: np.ndarray) -> tuple:
+    """(k, d) en ndarrays a partir d'un RSI deja calcule sur closes (RSI de meme periode)."""
+    rsi_min = _rolling_min(rsi_values, period)
+    rsi_max = _rolling_max(rsi_values, period)
+    rsi_range = rsi_max - rsi_min
+    # Prix plat (paires illiquides) : l'ecart du RSI n'est que du bruit d'arrondi, que la division
+    # amplifie jusqu'a 0-100. Ce bruit depend de l'arithmetique : on reprend le calcul pandas d'origine.
+    if np.any(rsi_range <= 1e-9 * rsi_max):
+        return _stoch_rsi_pandas(closes, period, k, d)
+    stoch_k = ((rsi_values - rsi_min) / _nonzero(rsi_range)) * 100
+    stoch_k = _rolling_mean(stoch_k, k)
+    stoch_d = _rolling_mean(stoch_k, d)
+    return stoch_k, stoch_d
+
+
+def _stoch_rsi_pandas(closes: np.ndarray, period: int, k: int, d: int) -> tuple:
+    """Stoch RSI par ewm / rolling pandas, pour les fenetres de RSI plat."""
+    delta = pd.Series(closes).diff()
+    gain = delta.where(delta > 0, 0.0)
+    loss = -delta.where(delta < 0, 0.0)
+    avg_gain = gain.ewm(com=period - 1, min_periods=period).mean()
+    avg_loss = loss.ewm(com=period - 1, min_periods=period).mean()
+    rsi_values = 100 - (100 / (1 + avg_gain / avg_loss.replace(0, np.nan)))
     rsi_min = rsi_values.rolling(window=period).min()
     rsi_max = rsi_values.rolling(window=period).max()
     stoch_k = ((rsi_values - rsi_min) / (rsi_max - rsi_min).replace(0, np.nan)) * 100
     stoch_k = stoch_k.rolling(window=k).mean()
     stoch_d = stoch_k.rolling(window=d).mean()
-    return {"k": stoch_k, "d": stoch_d}
+    return stoch_k.to_numpy(), stoch_d.to_numpy()
 
 
-def adx(df: pd.DataFrame, period: int = 14) -> dict:
-    high = df["high"]
-    low = df["low"]
-    close = df["close"]
+def stoch_rsi(series: pd.Series, period: int = 14, k: int = 3, d: int = 3) -> dict:
+    closes = series.to_numpy(dtype=np.float64)
+    stoch_k, stoch_d = _stoch_rsi(_rsi_wilder(closes, period), period, k, d, closes)
+    return {"k": pd.Series(stoch_k, index=series.index), "d": pd.Series(stoch_d, index=series.index)}
 
-    plus_dm = high.diff()
-    minus_dm = -low.diff()
-    plus_dm = plus_dm.where((plus_dm > minus_dm) & (plus_dm > 0), 0.0)
-    minus_dm = minus_dm.where((minus_dm > plus_dm) & (minus_dm > 0), 0.0)
 
-    tr1 = high - low
-    tr2 = (high - close.shift()).abs()
-    tr3 = (low - close.shift()).abs()
-    tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
+def _nonzero(values: np.ndarray) -> np.ndarray:
+    """Remplace les zeros par NaN (denominateurs), comme .replace(0, np.nan)."""
+    return np.where(values == 0, np.nan, values)
 
-    atr_val = tr.rolling(window=period).mean()
-    plus_di = 100 * (plus_dm.rolling(window=period).mean() / atr_val.replace(0, np.nan))
-    minus_di = 100 * (minus_dm.rolling(window=period).mean() / atr_val.replace(0, np.nan))
 
-    dx = 100 * ((plus_di - minus_di).abs() / (plus_di + minus_di).replace(0, np.nan))
-    adx_val = dx.rolling(window=period).mean()
+def _adx_components(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int) -> tuple:
+    """
+    ADX, +DI, -DI et ATR calcules ensemble sur les memes tableaux : le true range
+    n'est construit qu'une fois et sert a la fois a l'ATR et aux DI.
+    Retourne (adx, plus_di, minus_di, atr) en ndarrays.
+    """
+    up = np.empty_like(high)
+    up[:1] = np.nan
+    up[1:] = high[1:] - high[:-1]
+    down = np.empty_like(low)
+    down[:1] = np.nan
+    down[1:] = low[:-1] - low[1:]
+    plus_dm = np.where((up > down) & (up > 0), up, 0.0)
+    minus_dm = np.where((down > plus_dm) & (down > 0), down, 0.0)
 
-    return {"adx": adx_val, "plus_di": plus_di, "minus_di": minus_di}
+    atr_val = _rolling_mean(_true_range(high, low, close), period)
+    atr_nz = _nonzero(atr_val)
+    plus_di = 100 * (_rolling_mean(plus_dm, period) / atr_nz)
+    minus_di = 100 * (_rolling_mean(minus_dm, period) / atr_nz)
 
+    dx = 100 * (np.abs(plus_di - minus_di) / _nonzero(plus_di + minus_di))
+    adx_val = _rolling_mean(dx, period)
+    return adx_val, plus_di, minus_di, atr_val
 
-def obv(df: pd.DataFrame) -> pd.Series:
-    close = df["close"]
-    volume = df["volume"]
-    direction = np.where(close > close.shift(1), 1, np.where(close < close.shift(1), -1, 0))
-    obv_values = (volume * direction).cumsum()
-    return pd.Series(obv_values, index=df.index)
 
+def adx(df: pd.DataFrame, period: int = 14) -> dict:
+    adx_val, plus_di, minus_di, _ = _adx_components(
+        df["high"].to_numpy(dtype=np.float64),
+        df["low"].to_numpy(dtype=np.float64),
+        df["close"].to_numpy(dtype=np.float64),
+        period,
+    )
+    index = df.index
+    return {
+        "adx": pd.Series(adx_val, index=index),
+        "plus_di": pd.Series(plus_di, index=index),
+        "minus_di": pd.Series(minus_di, index=index),
+    }
+
+
+def _obv(close: np.ndarray, volume: np.ndarray) -> np.ndarray:
+    delta = np.diff(close, prepend=close[:1])
+    # Signe du delta sans branche (+1/-1/0) ; un delta NaN compte pour 0 comme avant
+    direction = (delta > 0).astype(np.float64) - (delta < 0)
+    return (volume * direction).cumsum()
 
-def ichimoku(df: pd.DataFrame) -> dict:
-    high = df["high"]
-    low = df["low"]
 
-    tenkan = (high.rolling(9).max() + low.rolling(9).min()) / 2
-    kijun = (high.rolling(26).max() + low.rolling(26).min()) / 2
-    senkou_a = ((tenkan + kijun) / 2).shift(26)
-    senkou_b = ((high.rolling(52).max() + low.rolling(52).min()) / 2).shift(26)
-    chikou = df["close"].shift(-26)
+def obv(df: pd.DataFrame) -> pd.Series:
+    return pd.Series(
+        _obv(df["close"].to_numpy(dtype=np.float64), df["volume"].to_numpy(dtype=np.float64)),
+        index=df.index,
+    )
+
+
+def _ichimoku(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> dict:
+    """Lignes Ichimoku en ndarrays (memes cles que ichimoku())."""
+    tenkan = (_rolling_max(high, 9) + _rolling_min(low, 9)) / 2
+    kijun = (_rolling_max(high, 26) + _rolling_min(low, 26)) / 2
+    senkou_a = _shift((tenkan + kijun) / 2, 26)
+    senkou_b = _shift((_rolling_max(high, 52) + _rolling_min(low, 52)) / 2, 26)
+    chikou = _shift(close, -26)
 
     return {
         "tenkan": tenkan,
@@ -126,45 +311,61 @@ def ichimoku(df: pd.DataFrame) -> dict:
     }
 
 
+def ichimoku(df: pd.DataFrame) -> dict:
+    lines = _ichimoku(
+        df["high"].to_numpy(dtype=np.float64),
+        df["low"].to_numpy(dtype=np.float64),
+        df["close"].to_numpy(dtype=np.float64),
+    )
+    return {name: pd.Series(values, index=df.index) for name, values in lines.items()}
+
+
+def _vwap(high: np.ndarray, low: np.ndarray, close: np.ndarray, volume: np.ndarray) -> np.ndarray:
+    typical_price = (high + low + close) / 3
+    return (typical_price * volume).cumsum() / _nonzero(volume.cumsum())
+
+
 def vwap(df: pd.DataFrame) -> pd.Series:
-    typical_price = (df["high"] + df["low"] + df["close"]) / 3
-    cum_volume = df["volume"].cumsum()
-    cum_tp_vol = (typical_price * df["volume"]).cumsum()
-    return cum_tp_vol / cum_volume.replace(0, np.nan)
+    return pd.Series(
+        _vwap(
+            df["high"].to_numpy(dtype=np.float64),
+            df["low"].to_numpy(dtype=np.float64),
+            df["close"].to_numpy(dtype=np.float64),
+            df["volume"].to_numpy(dtype=np.float64),
+        ),
+        index=df.index,
+    )
 
 
 def volume_sma(df: pd.DataFrame, period: int = 20) -> pd.Series:
     return sma(df["volume"], period)
 
 
+def _volume_ratio(volume: np.ndarray, fast: int, slow: int) -> np.ndarray:
+    return _rolling_mean(volume, fast) / _nonzero(_rolling_mean(volume, slow))
+
+
 def volume_ratio(df: pd.DataFrame, fast: int = 5, slow: int = 50) -> pd.Series:
-    vol_fast = sma(df["volume"], fast)
-    vol_slow = sma(df["volume"], slow)
-    return vol_fast / vol_slow.replace(0, np.nan)
+    return pd.Series(_volume_ratio(df["volume"].to_numpy(dtype=np.float64), fast, slow), index=df.index)
 
 
 def detect_market_structure(df: pd.DataFrame, lookback: int = 20) -> MarketStructure:
     if len(df) < lookback:
-        return MarketStructure("neutral", False, False, False, False)
+        return _NEUTRAL_STRUCTURE
 
-    recent = df.tail(lookback)
-    highs = recent["high"]
-    lows = recent["low"]
+    highs = df["high"].to_numpy()[-lookback:]
+    lows = df["low"].to_numpy()[-lookback:]
 
-    # Trouver les swing highs et swing lows (pivots simples)
-    swing_highs = []
-    swing_lows = []
-
-    for i in range(2, len(recent) - 2):
-        h = highs.iloc[i]
-        if h > highs.iloc[i - 1] and h > highs.iloc[i - 2] and h > highs.iloc[i + 1] and h > highs.iloc[i + 2]:
-            swing_highs.append(h)
-        lo = lows.iloc[i]
-        if lo < lows.iloc[i - 1] and lo < lows.iloc[i - 2] and lo < lows.iloc[i + 1] and lo < lows.iloc[i + 2]:
-            swing_lows.append(lo)
+    # Trouver les swing highs et swing lows (pivots simples : extreme sur 2 bougies de chaque cote)
+    h = highs[2:-2]
+    is_swing_high = (h > highs[1:-3]) & (h > highs[:-4]) & (h > highs[3:-1]) & (h > highs[4:])
+    lo = lows[2:-2]
+    is_swing_low = (lo < lows[1:-3]) & (lo < lows[:-4]) & (lo < lows[3:-1]) & (lo < lows[4:])
+    swing_highs = h[is_swing_high]
+    swing_lows = lo[is_swing_low]
 
     if len(swing_highs) < 2 or len(swing_lows) < 2:
-        return MarketStructure("neutral", False, False, False, False)
+        return _NEUTRAL_STRUCTURE
 
     hh = swing_highs[-1] > swing_highs[-2]
     hl = swing_lows[-1] > swing_lows[-2]
@@ -181,62 +382,72 @@ def detect_market_structure(df: pd.DataFrame, lookback: int = 20) -> MarketStruc
     return MarketStructure(trend, hh, hl, lh, ll)
 
 
-def detect_divergence(price: pd.Series, indicator: pd.Series, lookback: int = 14) -> str:
-    if len(price) < lookback or len(indicator) < lookback:
-        return "none"
-
-    price_recent = price.tail(lookback)
-    ind_recent = indicator.tail(lookback)
+def _divergence(price: np.ndarray, indicator: np.ndarray, lookback: int) -> str:
+    p = price[-lookback:]
+    ind = indicator[-lookback:]
+    half = lookback // 2
 
-    price_low1_idx = price_recent[:lookback // 2].idxmin()
-    price_low2_idx = price_recent[lookback // 2:].idxmin()
-
-    price_high1_idx = price_recent[:lookback // 2].idxmax()
-    price_high2_idx = price_recent[lookback // 2:].idxmax()
+    # Extremes de prix sur chaque moitie de la fenetre (positions, premiere occurrence)
+    low1 = p[:half].argmin()
+    low2 = half + p[half:].argmin()
+    high1 = p[:half].argmax()
+    high2 = half + p[half:].argmax()
 
     # Bullish divergence: prix fait lower low, RSI fait higher low
-    if price_recent[price_low2_idx] < price_recent[price_low1_idx]:
-        if ind_recent[price_low2_idx] > ind_recent[price_low1_idx]:
+    if p[low2] < p[low1]:
+        if ind[low2] > ind[low1]:
             return "bullish"
 
     # Bearish divergence: prix fait higher high, RSI fait lower high
-    if price_recent[price_high2_idx] > price_recent[price_high1_idx]:
-        if ind_recent[price_high2_idx] < ind_recent[price_high1_idx]:
+    if p[high2] > p[high1]:
+        if ind[high2] < ind[high1]:
             return "bearish"
 
     return "none"
 
 
-def detect_engulfing(df: pd.DataFrame) -> str:
-    if len(df) < 2:
+def detect_divergence(price: pd.Series, indicator: pd.Series, lookback: int = 14) -> str:
+    if len(price) < lookback or len(indicator) < lookback:
         return "none"
-    prev = df.iloc[-2]
-    curr = df.iloc[-1]
+    return _divergence(price.to_numpy(), indicator.to_numpy(), lookback)
+
+
+def _last_two_candles(df: pd.DataFrame) -> tuple:
+    """
+    (prev, curr) des deux dernieres bougies en tuples (open, high, low, close) de floats,
+    extraits une fois pour tous les detecteurs de patterns. prev vaut None s'il n'y a qu'une bougie.
+    """
+    rows = list(zip(*(df[col].to_numpy()[-2:].tolist() for col in ("open", "high", "low", "close"))))
+    if len(rows) < 2:
+        return None, (rows[0] if rows else None)
+    return rows[0], rows[1]
+
 
-    prev_body = prev["close"] - prev["open"]
-    curr_body = curr["close"] - curr["open"]
+def _engulfing(prev: tuple, curr: tuple) -> str:
+    p_open, _, _, p_close = prev
+    c_open, _, _, c_close = curr
+    prev_body = p_close - p_open
+    curr_body = c_close - c_open
 
     # Bullish engulfing
     if prev_body < 0 and curr_body > 0:
-        if curr["open"] <= prev["close"] and curr["close"] >= prev["open"]:
+        if c_open <= p_close and c_close >= p_open:
             return "bullish"
 
     # Bearish engulfing
     if prev_body > 0 and curr_body < 0:
-        if curr["open"] >= prev["close"] and curr["close"] <= prev["open"]:
+        if c_open >= p_close and c_close <= p_open:
             return "bearish"
 
     return "none"
 
 
-def detect_pin_bar(df: pd.DataFrame) -> str:
-    if len(df) < 1:
-        return "none"
-    candle = df.iloc[-1]
-    body = abs(candle["close"] - candle["open"])
-    upper_wick = candle["high"] - max(candle["open"], candle["close"])
-    lower_wick = min(candle["open"], candle["close"]) - candle["low"]
-    total_range = candle["high"] - candle["low"]
+def _pin_bar(curr: tuple) -> str:
+    c_open, c_high, c_low, c_close = curr
+    body = abs(c_close - c_open)
+    upper_wick = c_high - max(c_open, c_close)
+    lower_wick = min(c_open, c_close) - c_low
+    total_range = c_high - c_low
 
     if total_range == 0:
         return "none"
@@ -252,74 +463,100 @@ def detect_pin_bar(df: pd.DataFrame) -> str:
     return "none"
 
 
-def detect_doji(df: pd.DataFrame) -> str:
-    """Detecte un doji (corps < 10% du range). Retourne bullish/bearish/neutral."""
-    if len(df) < 2:
-        return "none"
-    candle = df.iloc[-1]
-    total_range = candle["high"] - candle["low"]
+def _doji(prev: tuple, curr: tuple) -> str:
+    c_open, c_high, c_low, c_close = curr
+    total_range = c_high - c_low
     if total_range == 0:
         return "none"
-    body = abs(candle["close"] - candle["open"])
+    body = abs(c_close - c_open)
     if body / total_range >= 0.10:
         return "none"
     # Doji detecte — direction basee sur la bougie precedente
-    prev = df.iloc[-2]
-    if prev["close"] < prev["open"]:
+    p_open, _, _, p_close = prev
+    if p_close < p_open:
         return "bullish"  # doji apres bougie baissiere = retournement potentiel
-    elif prev["close"] > prev["open"]:
+    elif p_close > p_open:
         return "bearish"  # doji apres bougie haussiere = retournement potentiel
     return "neutral"
 
 
-def detect_hammer(df: pd.DataFrame) -> str:
-    """Detecte un marteau (corps en haut, longue meche basse >2x corps)."""
-    if len(df) < 2:
-        return "none"
-    candle = df.iloc[-1]
-    body = abs(candle["close"] - candle["open"])
-    total_range = candle["high"] - candle["low"]
+def _hammer(prev: tuple, curr: tuple) -> str:
+    c_open, c_high, c_low, c_close = curr
+    body = abs(c_close - c_open)
+    total_range = c_high - c_low
     if total_range == 0 or body == 0:
         return "none"
-    upper_wick = candle["high"] - max(candle["open"], candle["close"])
-    lower_wick = min(candle["open"], candle["close"]) - candle["low"]
+    upper_wick = c_high - max(c_open, c_close)
+    lower_wick = min(c_open, c_close) - c_low
+    p_open, _, _, p_close = prev
     # Marteau classique : corps en haut, longue meche basse
     if lower_wick > body * 2 and upper_wick < body * 0.5:
-        prev = df.iloc[-2]
-        if prev["close"] < prev["open"]:
+        if p_close < p_open:
             return "bullish"  # marteau apres baisse = retournement haussier
         return "neutral"
     # Inverted hammer : corps en bas, longue meche haute
     if upper_wick > body * 2 and lower_wick < body * 0.5:
-        prev = df.iloc[-2]
-        if prev["close"] > prev["open"]:
+        if p_close > p_open:
             return "bearish"  # inverted hammer apres hausse
         return "neutral"
     return "none"
 
 
-def detect_shooting_star(df: pd.DataFrame) -> str:
-    """Detecte une etoile filante (corps en bas, longue meche haute >2x corps)."""
-    if len(df) < 2:
-        return "none"
-    candle = df.iloc[-1]
-    body = abs(candle["close"] - candle["open"])
-    total_range = candle["high"] - candle["low"]
+def _shooting_star(prev: tuple, curr: tuple) -> str:
+    c_open, c_high, c_low, c_close = curr
+    body = abs(c_close - c_open)
+    total_range = c_high - c_low
     if total_range == 0 or body == 0:
         return "none"
-    upper_wick = candle["high"] - max(candle["open"], candle["close"])
-    lower_wick = min(candle["open"], candle["close"]) - candle["low"]
+    upper_wick = c_high - max(c_open, c_close)
+    lower_wick = min(c_open, c_close) - c_low
     # Etoile filante : corps en bas, longue meche haute
     if upper_wick > body * 2 and lower_wick < body * 0.5:
-        prev = df.iloc[-2]
-        if prev["close"] > prev["open"]:
+        p_open, _, _, p_close = prev
+        if p_close > p_open:
             return "bearish"  # apres hausse = signal de retournement baissier
         return "neutral"
     return "none"
 
 
-def analyze_candle_context(df: pd.DataFrame, lookback: int = 5) -> dict:
-    """Analyse les N dernieres bougies pour detecter resistance/support et contexte."""
+def detect_engulfing(df: pd.DataFrame) -> str:
+    if len(df) < 2:
+        return "none"
+    return _engulfing(*_last_two_candles(df))
+
+
+def detect_pin_bar(df: pd.DataFrame) -> str:
+    if len(df) < 1:
+        return "none"
+    return _pin_bar(_last_two_candles(df)[1])
+
+
+def detect_doji(df: pd.DataFrame) -> str:
+    """Detecte un doji (corps < 10% du range). Retourne bullish/bearish/neutral."""
+    if len(df) < 2:
+        return "none"
+    return _doji(*_last_two_candles(df))
+
+
+def detect_hammer(df: pd.DataFrame) -> str:
+    """Detecte un marteau (corps en haut, longue meche basse >2x corps)."""
+    if len(df) < 2:
+        return "none"
+    return _hammer(*_last_two_candles(df))
+
+
+def detect_shooting_star(df: pd.DataFrame) -> str:
+    """Detecte une etoile filante (corps en bas, longue meche haute >2x corps)."""
+    if len(df) < 2:
+        return "none"
+    return _shooting_star(*_last_two_candles(df))
+
+
+def analyze_candle_context(df: pd.DataFrame, lookback: int = 5, atr_values: np.ndarray | None = None) -> dict:
+    """
+    Analyse les N dernieres bougies pour detecter resistance/support et contexte.
+    atr_values: ATR(14) deja calcule sur df (evite de reconstruire le true range).
+    """
     result = {
         "big_candle_resistance": False,
         "big_candle_support": False,
@@ -330,44 +567,42 @@ def analyze_candle_context(df: pd.DataFrame, lookback: int = 5) -> dict:
     if len(df) < lookback + 14:
         return result
 
-    atr_values = atr(df, 14)
-    atr_avg = atr_values.tail(14).mean()
-    if atr_avg == 0 or pd.isna(atr_avg):
+    if atr_values is None:
+        atr_values = atr(df, 14).to_numpy()
+    # Moyenne des 14 derniers ATR en ignorant les NaN (comme Series.mean)
+    atr_tail = atr_values[-14:]
+    atr_tail = atr_tail[~np.isnan(atr_tail)]
+    if len(atr_tail) == 0:
+        return result
+    atr_avg = atr_tail.mean()
+    if atr_avg == 0:
         return result
 
-    recent = df.tail(lookback)
-    current_price = df.iloc[-1]["close"]
+    opens = df["open"].to_numpy()
+    highs = df["high"].to_numpy()
+    lows = df["low"].to_numpy()
+    closes = df["close"].to_numpy()
+    current_price = closes[-1]
 
     # Seuil grosse bougie : corps > 1.5x ATR moyen
     big_threshold = atr_avg * 1.5
 
-    body_ratios = []
-    for i in range(len(recent)):
-        candle = recent.iloc[i]
-        body = abs(candle["close"] - candle["open"])
-        total_range = candle["high"] - candle["low"]
-        body_ratios.append(body / total_range if total_range > 0 else 0)
-
-        # Grosse bougie rouge (baissiere) pres du prix actuel = resistance
-        if candle["close"] < candle["open"] and body > big_threshold:
-            candle_top = max(candle["open"], candle["close"])
-            candle_bottom = min(candle["open"], candle["close"])
-            if candle_bottom <= current_price <= candle_top:
-                result["big_candle_resistance"] = True
-
-        # Grosse bougie verte (haussiere) pres du prix actuel = support
-        if candle["close"] > candle["open"] and body > big_threshold:
-            candle_top = max(candle["open"], candle["close"])
-            candle_bottom = min(candle["open"], candle["close"])
-            if candle_bottom <= current_price <= candle_top:
-                result["big_candle_support"] = True
-
-    result["avg_body_ratio"] = sum(body_ratios) / len(body_ratios) if body_ratios else 0
+    start = len(df) - lookback
+    o, h, lo, c = opens[start:], highs[start:], lows[start:], closes[start:]
+    body = np.abs(c - o)
+    total_range = h - lo
+    body_ratios = np.divide(body, total_range, out=np.zeros(len(body)), where=total_range > 0)
+
+    # Grosse bougie dont le corps contient le prix actuel : rouge = resistance, verte = support
+    big_at_price = (body > big_threshold) & (np.minimum(o, c) <= current_price) & (current_price <= np.maximum(o, c))
+    result["big_candle_resistance"] = bool(np.any(big_at_price & (c < o)))
+    result["big_candle_support"] = bool(np.any(big_at_price & (c > o)))
+
+    result["avg_body_ratio"] = body_ratios.mean() if len(body_ratios) else 0
 
     # Derniere bougie
-    last = df.iloc[-1]
-    last_body = last["close"] - last["open"]
-    last_range = last["high"] - last["low"]
+    last_body = current_price - opens[-1]
+    last_range = highs[-1] - lows[-1]
     if last_range > 0:
         body_ratio = abs(last_body) / last_range
         if last_body > 0 and body_ratio > 0.4:
@@ -375,24 +610,14 @@ def analyze_candle_context(df: pd.DataFrame, lookback: int = 5) -> dict:
         elif last_body < 0 and body_ratio > 0.4:
             result["last_candle_direction"] = "bearish"
 
-    # Bougies consecutives dans la meme direction
-    consecutive = 0
-    direction = None
-    for i in range(len(df) - 1, max(len(df) - 10, -1), -1):
-        c = df.iloc[i]
-        if c["close"] > c["open"]:
-            d = "bullish"
-        elif c["close"] < c["open"]:
-            d = "bearish"
-        else:
-            break
-        if direction is None:
-            direction = d
-            consecutive = 1
-        elif d == direction:
-            consecutive += 1
-        else:
-            break
+    # Bougies consecutives dans la meme direction (9 dernieres au plus, de la plus recente
+    # a la plus ancienne) ; une bougie neutre ou de sens oppose arrete la serie
+    signs = np.sign(closes[-9:] - opens[-9:])[::-1]
+    if signs[0] == 1 or signs[0] == -1:
+        breaks = np.flatnonzero(signs != signs[0])
+        consecutive = int(breaks[0]) if len(breaks) else len(signs)
+    else:
+        consecutive = 0
     result["consecutive_direction"] = consecutive
 
     return result
@@ -402,35 +627,89 @@ def compute_all_indicators(df: pd.DataFrame, config: dict) -> dict:
     if df.empty or len(df) < 50:
         return {}
 
+    index = df.index
     close = df["close"]
+    # Colonnes extraites une fois ; les noyaux travaillent sur ces tableaux et seules
+    # les sorties exposees sont remises en Series
+    high_arr = df["high"].to_numpy(dtype=np.float64)
+    low_arr = df["low"].to_numpy(dtype=np.float64)
+    close_arr = close.to_numpy(dtype=np.float64)
+    volume_arr = df["volume"].to_numpy(dtype=np.float64)
 
     # --- Indicateurs de base ---
-    ema_fast = ema(close, config.get("ema_fast", 20))
-    ema_slow_val = ema(close, config.get("ema_slow", 50))
-    ema_200_val = ema(close, 200)
-    rsi_values = rsi(close, config.get("rsi_period", 14))
-    atr_values = atr(df, 14)
-    bb = bollinger_bands(close, 20, 2)
-    vol_ratio = volume_ratio(df)
+    ema_fast_arr = _ema(close_arr, config.get("ema_fast", 20))
+    ema_slow_arr = _ema(close_arr, config.get("ema_slow", 50))
+    ema_200_arr = _ema(close_arr, 200)
+    ema_fast = pd.Series(ema_fast_arr, index=index)
+    ema_slow_val = pd.Series(ema_slow_arr, index=index)
+    ema_200_val = pd.Series(ema_200_arr, index=index)
+    rsi_arr = _rsi_wilder(close_arr, config.get("rsi_period", 14))
+    rsi_values = pd.Series(rsi_arr, index=index)
+    # ADX et ATR(14) partagent le meme true range : un seul calcul fusionne
+    adx_val, plus_di, minus_di, atr_arr = _adx_components(high_arr, low_arr, close_arr, 14)
+    atr_values = pd.Series(atr_arr, index=index)
+    bb_upper, bb_middle, bb_lower, bb_bandwidth = _bollinger(close_arr, 20, 2)
+    bb = {
+        "upper": pd.Series(bb_upper, index=index),
+        "middle": pd.Series(bb_middle, index=index),
+        "lower": pd.Series(bb_lower, index=index),
+        "bandwidth": pd.Series(bb_bandwidth, index=index),
+    }
+    vol_ratio_arr = _volume_ratio(volume_arr, 5, 50)
+    vol_ratio = pd.Series(vol_ratio_arr, index=index)
     structure = detect_market_structure(df, config.get("structure_lookback", 20))
-    divergence = detect_divergence(close, rsi_values)
-    engulfing = detect_engulfing(df)
-    pin_bar = detect_pin_bar(df)
-    doji = detect_doji(df)
-    hammer = detect_hammer(df)
-    shooting_star = detect_shooting_star(df)
-    candle_context = analyze_candle_context(df)
+    divergence = _divergence(close_arr, rsi_arr, 14)
+    # Patterns de bougies : les deux dernieres bougies extraites une seule fois (len(df) >= 50)
+    prev_candle, last_candle = _last_two_candles(df)
+    engulfing = _engulfing(prev_candle, last_candle)
+    pin_bar = _pin_bar(last_candle)
+    doji = _doji(prev_candle, last_candle)
+    hammer = _hammer(prev_candle, last_candle)
+    shooting_star = _shooting_star(prev_candle, last_candle)
+    candle_context = analyze_candle_context(df, atr_values=atr_arr)
 
     # --- Indicateurs avances ---
-    macd_data = macd(close)
-    stoch_rsi_data = stoch_rsi(close)
-    adx_data = adx(df)
-    obv_values = obv(df)
-    ichimoku_data = ichimoku(df)
-    vwap_values = vwap(df)
+    macd_arr, macd_signal_arr, macd_hist_arr = _macd(close_arr, 12, 26, 9)
+    macd_data = {
+        "macd": pd.Series(macd_arr, index=index),
+        "signal": pd.Series(macd_signal_arr, index=index),
+        "histogram": pd.Series(macd_hist_arr, index=index),
+    }
+    # Stoch RSI(14) : reutilise le RSI deja calcule si la periode configuree est la meme
+    stoch_base = rsi_arr if config.get("rsi_period", 14) == 14 else _rsi_wilder(close_arr, 14)
+    stoch_k, stoch_d = _stoch_rsi(stoch_base, 14, 3, 3, close_arr)
+    stoch_rsi_data = {"k": pd.Series(stoch_k, index=index), "d": pd.Series(stoch_d, index=index)}
+    adx_data = {
+        "adx": pd.Series(adx_val, index=index),
+        "plus_di": pd.Series(plus_di, index=index),
+        "minus_di": pd.Series(minus_di, index=index),
+    }
+    obv_arr = _obv(close_arr, volume_arr)
+    obv_values = pd.Series(obv_arr, index=index)
+    ichimoku_lines = _ichimoku(high_arr, low_arr, close_arr)
+    ichimoku_data = {name: pd.Series(values, index=index) for name, values in ichimoku_lines.items()}
+    vwap_arr = _vwap(high_arr, low_arr, close_arr, volume_arr)
+    vwap_values = pd.Series(vwap_arr, index=index)
 
     # Divergence MACD (en plus de la divergence RSI)
-    macd_divergence = detect_divergence(close, macd_data["macd"])
+    macd_divergence = _divergence(close_arr, macd_arr, 14)
+
+    # Scalaires precalcules pour les detecteurs d'entree
+    obv_trend_up = bool(obv_arr[-1] > obv_arr[-5])
+    recent_high_20 = high_arr[-20:].max()
+    recent_low_20 = low_arr[-20:].min()
+    senkou_a_last = float(ichimoku_lines["senkou_a"][-1])
+    senkou_b_last = float(ichimoku_lines["senkou_b"][-1])
+    if senkou_a_last > 0 and senkou_b_last > 0:
+        cloud_top = max(senkou_a_last, senkou_b_last)
+        cloud_bottom = min(senkou_a_last, senkou_b_last)
+    else:
+        cloud_top = cloud_bottom = None
+    # Moyenne ATR sur 50 bougies pour le regime de marche (NaN ignores, comme Series.mean)
+    atr_tail = atr_arr[-50:]
+    atr_tail_valid = atr_tail == atr_tail
+    atr_tail_count = int(atr_tail_valid.sum())
+    atr_mean50 = np.where(atr_tail_valid, atr_tail, 0.0).sum() / atr_tail_count if atr_tail_count else np.nan
 
     return {
         # Series de base
@@ -441,7 +720,7 @@ def compute_all_indicators(df: pd.DataFrame, config: dict) -> dict:
         "atr": atr_values,
         "bb": bb,
         "volume_ratio": vol_ratio,
-        "volume_sma": volume_sma(df),
+        "volume_sma": pd.Series(_rolling_mean(volume_arr, 20), index=index),
         "structure": structure,
         "divergence": divergence,
         "engulfing": engulfing,
@@ -459,24 +738,32 @@ def compute_all_indicators(df: pd.DataFrame, config: dict) -> dict:
         "vwap": vwap_values,
         "macd_divergence": macd_divergence,
         # Dernieres valeurs
-        "last_close": close.iloc[-1],
-        "last_ema_fast": ema_fast.iloc[-1],
-        "last_ema_slow": ema_slow_val.iloc[-1],
-        "last_ema_200": ema_200_val.iloc[-1],
-        "last_rsi": rsi_values.iloc[-1],
-        "last_atr": atr_values.iloc[-1],
-        "last_bb_upper": bb["upper"].iloc[-1],
-        "last_bb_lower": bb["lower"].iloc[-1],
-        "last_bb_bandwidth": bb["bandwidth"].iloc[-1],
-        "last_volume_ratio": vol_ratio.iloc[-1] if not vol_ratio.empty else 0,
-        "last_macd": macd_data["macd"].iloc[-1],
-        "last_macd_signal": macd_data["signal"].iloc[-1],
-        "last_macd_histogram": macd_data["histogram"].iloc[-1],
-        "last_stoch_k": stoch_rsi_data["k"].iloc[-1],
-        "last_stoch_d": stoch_rsi_data["d"].iloc[-1],
-        "last_adx": adx_data["adx"].iloc[-1],
-        "last_plus_di": adx_data["plus_di"].iloc[-1],
-        "last_minus_di": adx_data["minus_di"].iloc[-1],
-        "last_obv": obv_values.iloc[-1],
-        "last_vwap": vwap_values.iloc[-1],
+        "last_close": close_arr[-1],
+        "last_ema_fast": ema_fast_arr[-1],
+        "last_ema_slow": ema_slow_arr[-1],
+        "last_ema_200": ema_200_arr[-1],
+        "last_rsi": rsi_arr[-1],
+        "last_atr": atr_arr[-1],
+        "last_atr_mean50": atr_mean50,
+        "last_bb_upper": bb_upper[-1],
+        "last_bb_lower": bb_lower[-1],
+        "last_bb_bandwidth": bb_bandwidth[-1],
+        "last_volume_ratio": vol_ratio_arr[-1],
+        "last_macd": macd_arr[-1],
+        "last_macd_signal": macd_signal_arr[-1],
+        "last_macd_histogram": macd_hist_arr[-1],
+        "last_stoch_k": stoch_k[-1],
+        "last_stoch_d": stoch_d[-1],
+        "last_adx": adx_val[-1],
+        "last_plus_di": plus_di[-1],
+        "last_minus_di": minus_di[-1],
+        "last_obv": obv_arr[-1],
+        "obv_trend_up": obv_trend_up,
+        "recent_high_20": recent_high_20,
+        "recent_low_20": recent_low_20,
+        "last_senkou_a": senkou_a_last,
+        "last_senkou_b": senkou_b_last,
+        "last_cloud_top": cloud_top,
+        "last_cloud_bottom": cloud_bottom,
+        "last_vwap": vwap_arr[-1],
     }
@@ -1,4 +1,9 @@
+import asyncio
+import time
+import aiohttp
 import ccxt.async_support as ccxt
+import ccxt.pro as ccxtpro
+import numpy as np
 import pandas as pd
 import logging
 from datetime import datetime, timedelta
@@ -6,26 +11,72 @@ from app.config import MEXC_API_KEY, MEXC_SECRET_KEY, get_enabled_pairs
 
 logger = logging.getLogger(__name__)
 
+# Requetes simultanees max par type d'endpoint (au-dela, les appels attendent leur tour)
+_ENDPOINT_CONCURRENCY = {
+    "ohlcv": 8,
+    "orderbook": 8,
+    "funding": 4,
+    "open_interest": 4,
+    "ticker": 4,
+}
+# Erreurs consecutives tolerees avant de temporiser un endpoint
+_BACKOFF_AFTER_ERRORS = 3
+_BACKOFF_MAX_SEC = 30
+# Seules ces erreurs comptent pour le backoff (symbole inconnu, endpoint non supporte... ne temporisent pas)
+_TRANSIENT_ERRORS = (ccxt.RateLimitExceeded, ccxt.DDoSProtection, ccxt.NetworkError)
+# Duree de validite des tickers / funding rates obtenus par appel batch
+_BULK_CACHE_TTL_SEC = 2.0
+# En dessous de ce delai, l'historique OHLCV en cache est resservi tel quel
+_OHLCV_REFRESH_SEC = 1.0
+# Periode de rafraichissement (et duree de validite) de la balance en cache
+_BALANCE_REFRESH_SEC = 5.0
+
 
 class MarketData:
     def __init__(self):
         self.exchange: ccxt.mexc = None
         self.exchange_private: ccxt.mexc = None
+        self._session: aiohttp.ClientSession | None = None
+        self.exchange_ws: ccxtpro.mexc = None
+        self._ticker_stream: asyncio.Task | None = None
+        self._balance_cache: tuple[float, dict] | None = None  # (monotonic, balance USDT)
+        self._balance_epoch = 0  # incremente a chaque invalidation
+        self._balance_task: asyncio.Task | None = None
         self._cache: dict = {}
         self._last_oi: dict[str, float] = {}  # symbol -> last OI value
+        self._sem = {kind: asyncio.Semaphore(n) for kind, n in _ENDPOINT_CONCURRENCY.items()}
+        self._consecutive_errors: dict[str, int] = dict.fromkeys(_ENDPOINT_CONCURRENCY, 0)
+        self._ticker_cache: dict[str, tuple[float, dict]] = {}  # symbol -> (monotonic, ticker)
+        self._funding_cache: dict[str, tuple[float, float]] = {}  # symbol -> (monotonic, rate %)
+        self._ohlcv_cache: dict[tuple[str, str], tuple[float, pd.DataFrame]] = {}  # (symbol, tf) -> (monotonic, df)
+        self._margin_state: dict[tuple[str, int], tuple[int, int]] = {}  # (symbol, positionType) -> (openType, leverage)
 
     def is_connected(self) -> bool:
         return self.exchange is not None and self.exchange.markets is not None
 
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Session HTTP partagee par les deux clients ccxt (connexions keep-alive reutilisees)."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(
+                limit=100,
+                limit_per_host=30,
+                keepalive_timeout=75,
+                ttl_dns_cache=300,
+                enable_cleanup_closed=True,
+            ))
+        return self._session
+
     async def connect(self):
         # Exchange public (pas de cle API, pas de restriction IP)
         try:
             self.exchange = ccxt.mexc({
                 "options": {"defaultType": "swap"},
                 "enableRateLimit": True,
+                "session": self._get_session(),
             })
             await self.exchange.load_markets()
             logger.info(f"Connecte a MEXC Futures (public) - {len(self.exchange.markets)} marches")
+            self._start_ticker_stream()
         except Exception as e:
             logger.warning(f"Connexion MEXC public echouee: {e}")
             if self.exchange:
@@ -44,25 +95,131 @@ class MarketData:
                     "secret": MEXC_SECRET_KEY,
                     "options": {"defaultType": "swap"},
                     "enableRateLimit": True,
+                    "session": self._get_session(),
                 })
-                self.exchange_private.markets = self.exchange.markets
+                # Index des marches (markets_by_id, symbols...) construit ici plutot qu'au premier ordre
+                self.exchange_private.set_markets(self.exchange.markets, self.exchange.currencies)
                 logger.info("MEXC prive configure (pour balance)")
+                self.start_balance_refresh()
             except Exception as e:
                 logger.warning(f"MEXC prive non disponible: {e}")
                 self.exchange_private = None
 
     async def close(self):
+        if self._balance_task is not None:
+            self._balance_task.cancel()
+            self._balance_task = None
+        if self._ticker_stream is not None:
+            self._ticker_stream.cancel()
+            self._ticker_stream = None
+        if self.exchange_ws:
+            await self.exchange_ws.close()
+            self.exchange_ws = None
         if self.exchange:
             await self.exchange.close()
         if self.exchange_private:
             await self.exchange_private.close()
+        # ccxt ne ferme pas une session fournie de l'exterieur
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _start_ticker_stream(self):
+        """Lance le flux WebSocket des tickers des paires actives (une seule fois)."""
+        if self._ticker_stream is not None and not self._ticker_stream.done():
+            return
+        symbols = [s for s in get_enabled_pairs() if s in self.exchange.markets]
+        if not symbols:
+            return
+        if self.exchange_ws is None:
+            self.exchange_ws = ccxtpro.mexc({"options": {"defaultType": "swap"}})
+        self._ticker_stream = asyncio.create_task(self._watch_tickers_loop(symbols))
+
+    async def _watch_tickers_loop(self, symbols: list[str]):
+        """
+        Alimente _ticker_cache par push WebSocket : fetch_ticker y repond sans requete REST.
+        Si le flux tombe, le cache expire et fetch_ticker repasse par le REST.
+        """
+        errors = 0
+        while True:
+            try:
+                tickers = await self.exchange_ws.watch_tickers(symbols)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                errors += 1
+                logger.warning(f"Flux tickers WebSocket interrompu: {e}")
+                await asyncio.sleep(min(_BACKOFF_MAX_SEC, 2 ** errors))
+                continue
+            errors = 0
+            now = time.monotonic()
+            for symbol, t in tickers.items():
+                self._ticker_cache[symbol] = (now, self._format_ticker(t))
+
+    async def _call(self, kind: str, method, *args, **kwargs):
+        """
+        Appel exchange borne par la semaphore de l'endpoint.
+        Apres plusieurs erreurs transitoires consecutives (rate limit, reseau), backoff exponentiel
+        avant de prendre la semaphore : l'attente ne bloque pas les appels des autres symboles.
+        """
+        errors = self._consecutive_errors[kind]
+        if errors > _BACKOFF_AFTER_ERRORS:
+            await asyncio.sleep(min(_BACKOFF_MAX_SEC, 2 ** (errors - _BACKOFF_AFTER_ERRORS)))
+        async with self._sem[kind]:
+            try:
+                result = await method(*args, **kwargs)
+            except _TRANSIENT_ERRORS:
+                self._consecutive_errors[kind] += 1
+                raise
+        self._consecutive_errors[kind] = 0
+        return result
+
+    @staticmethod
+    def _ohlcv_frame(ohlcv: list) -> pd.DataFrame:
+        # Conversion unique en float64 puis colonnes prises par vues (pas d'inference par colonne)
+        arr = np.asarray(ohlcv, dtype=np.float64).reshape(-1, 6)
+        # Horodatage ms -> datetime64[ns] par simple vue, sans le parsing d'unite de pd.to_datetime
+        index = pd.DatetimeIndex((arr[:, 0].astype(np.int64) * 1_000_000).view("datetime64[ns]"), name="timestamp")
+        return pd.DataFrame(
+            {"open": arr[:, 1], "high": arr[:, 2], "low": arr[:, 3], "close": arr[:, 4], "volume": arr[:, 5]},
+            index=index,
+        )
+
+    async def _refresh_ohlcv_tail(self, symbol: str, timeframe: str, df: pd.DataFrame) -> pd.DataFrame | None:
+        """
+        Met a jour l'historique en cache avec les dernieres bougies seulement.
+        None si le cache est trop ancien ou si la suite ne se raccorde pas (refetch complet).
+        """
+        last_ts = df.index[-1].value // 1_000_000  # ns -> ms
+        tf_ms = self.exchange.parse_timeframe(timeframe) * 1000
+        if time.time() * 1000 - last_ts >= 2 * tf_ms:
+            return None
+        ohlcv = await self._call("ohlcv", self.exchange.fetch_ohlcv, symbol, timeframe, since=last_ts, limit=3)
+        tail = self._ohlcv_frame(ohlcv)
+        # La premiere bougie recue doit etre la derniere bougie (en cours) du cache
+        if tail.empty or tail.index[0] != df.index[-1]:
+            return None
+        return pd.concat([df.iloc[:-1], tail]).iloc[-len(df):]
 
     async def fetch_ohlcv(self, symbol: str, timeframe: str, limit: int = 100) -> pd.DataFrame:
         try:
-            ohlcv = await self.exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
-            df = pd.DataFrame(ohlcv, columns=["timestamp", "open", "high", "low", "close", "volume"])
-            df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms")
-            df.set_index("timestamp", inplace=True)
+            key = (symbol, timeframe)
+            cached = self._ohlcv_cache.get(key)
+            if cached is not None and len(cached[1]) >= limit:
+                fetched_at, df = cached
+                if time.monotonic() - fetched_at < _OHLCV_REFRESH_SEC:
+                    return df.tail(limit)
+                df = await self._refresh_ohlcv_tail(symbol, timeframe, df)
+                if df is not None:
+                    self._ohlcv_cache[key] = (time.monotonic(), df)
+                    return df.tail(limit)
+
+            ohlcv = await self._call("ohlcv", self.exchange.fetch_ohlcv, symbol, timeframe, limit=limit)
+            df = self._ohlcv_frame(ohlcv)
+            # Le cache garde l'historique le plus long demande pour cette paire / timeframe
+            cached = self._ohlcv_cache.get(key)
+            if not df.empty and (cached is None or len(df) >= len(cached[1])):
+                self._ohlcv_cache[key] = (time.monotonic(), df)
             return df
         except Exception as e:
             logger.error(f"Erreur fetch_ohlcv {symbol} {timeframe}: {e}")
@@ -70,7 +227,7 @@ class MarketData:
 
     async def fetch_orderbook(self, symbol: str, limit: int = 10) -> dict:
         try:
-            ob = await self.exchange.fetch_order_book(symbol, limit=limit)
+            ob = await self._call("orderbook", self.exchange.fetch_order_book, symbol, limit=limit)
             if not ob["bids"] or not ob["asks"]:
                 return {"spread_pct": 999, "bid_depth": 0, "ask_depth": 0, "mid_price": 0}
 
@@ -95,8 +252,11 @@ class MarketData:
             return {"spread_pct": 999, "bid_depth": 0, "ask_depth": 0, "mid_price": 0}
 
     async def fetch_funding_rate(self, symbol: str) -> float:
+        cached = _fresh(self._funding_cache, symbol)
+        if cached is not None:
+            return cached
         try:
-            funding = await self.exchange.fetch_funding_rate(symbol)
+            funding = await self._call("funding", self.exchange.fetch_funding_rate, symbol)
             return funding.get("fundingRate", 0) * 100  # en %
         except Exception as e:
             logger.error(f"Erreur fetch_funding_rate {symbol}: {e}")
@@ -104,41 +264,127 @@ class MarketData:
 
     async def fetch_open_interest(self, symbol: str) -> float:
         try:
-            oi = await self.exchange.fetch_open_interest(symbol)
+            oi = await self._call("open_interest", self.exchange.fetch_open_interest, symbol)
             return oi.get("openInterestAmount", 0)
         except Exception as e:
             logger.error(f"Erreur fetch_open_interest {symbol}: {e}")
             return 0.0
 
-    async def fetch_ticker(self, symbol: str) -> dict:
+    @staticmethod
+    def _format_ticker(ticker: dict) -> dict:
+        return {
+            "price": ticker.get("last", 0),
+            "volume_24h": ticker.get("quoteVolume", 0),
+            "change_24h_pct": ticker.get("percentage", 0),
+            "high_24h": ticker.get("high", 0),
+            "low_24h": ticker.get("low", 0),
+        }
+
+    def last_price(self, symbol: str, max_age: float = 0.5) -> float | None:
+        """Dernier prix en cache (flux WebSocket ou appel recent) s'il a moins de max_age secondes."""
+        cached = _fresh(self._ticker_cache, symbol, max_age)
+        if cached is None:
+            return None
+        return cached.get("price") or None
+
+    async def fetch_ticker(self, symbol: str, max_age: float = _BULK_CACHE_TTL_SEC) -> dict:
+        cached = _fresh(self._ticker_cache, symbol, max_age)
+        if cached is not None:
+            return dict(cached)  # copie : certains appelants enrichissent le dict retourne
         try:
-            ticker = await self.exchange.fetch_ticker(symbol)
-            return {
-                "price": ticker.get("last", 0),
-                "volume_24h": ticker.get("quoteVolume", 0),
-                "change_24h_pct": ticker.get("percentage", 0),
-                "high_24h": ticker.get("high", 0),
-                "low_24h": ticker.get("low", 0),
-            }
+            ticker = self._format_ticker(await self._call("ticker", self.exchange.fetch_ticker, symbol))
+            self._ticker_cache[symbol] = (time.monotonic(), ticker)
+            return dict(ticker)
         except Exception as e:
             logger.error(f"Erreur fetch_ticker {symbol}: {e}")
             return {"price": 0, "volume_24h": 0, "change_24h_pct": 0}
 
+    async def fetch_all_tickers(self, symbols: list[str]) -> dict[str, dict]:
+        """Tickers de plusieurs paires en un seul appel ; {} si l'endpoint batch echoue."""
+        try:
+            if not self.exchange.has.get("fetchTickers"):
+                return {}
+            tickers = await self._call("ticker", self.exchange.fetch_tickers, symbols)
+            wanted = set(symbols)
+            result = {symbol: self._format_ticker(t) for symbol, t in tickers.items() if symbol in wanted}
+            now = time.monotonic()
+            self._ticker_cache.update((symbol, (now, t)) for symbol, t in result.items())
+            return result
+        except Exception as e:
+            logger.warning(f"fetch_tickers batch indisponible, repli par paire: {e}")
+            return {}
+
+    async def fetch_all_funding_rates(self, symbols: list[str]) -> dict[str, float]:
+        """Funding rates (en %) de plusieurs paires en un seul appel ; {} si l'endpoint batch echoue."""
+        try:
+            if not self.exchange.has.get("fetchFundingRates"):
+                return {}
+            rates = await self._call("funding", self.exchange.fetch_funding_rates, symbols)
+            wanted = set(symbols)
+            result = {symbol: (r.get("fundingRate") or 0) * 100 for symbol, r in rates.items() if symbol in wanted}
+            now = time.monotonic()
+            self._funding_cache.update((symbol, (now, rate)) for symbol, rate in result.items())
+            return result
+        except Exception as e:
+            logger.warning(f"fetch_funding_rates batch indisponible, repli par paire: {e}")
+            return {}
+
+    async def _fetch_usdt_balance(self) -> dict:
+        epoch = self._balance_epoch
+        balance = await self.exchange_private.fetch_balance()
+        usdt = balance.get("USDT", {})
+        result = {
+            "total": usdt.get("total", 0),
+            "free": usdt.get("free", 0),
+            "used": usdt.get("used", 0),
+        }
+        # Une reponse partie avant un trade (invalidation entre-temps) ne repeuple pas le cache
+        if epoch == self._balance_epoch:
+            self._balance_cache = (time.monotonic(), result)
+        return result
+
     async def fetch_balance(self) -> dict:
         if not self.exchange_private:
             return {"total": 0, "free": 0, "used": 0}
         try:
-            balance = await self.exchange_private.fetch_balance()
-            usdt = balance.get("USDT", {})
-            return {
-                "total": usdt.get("total", 0),
-                "free": usdt.get("free", 0),
-                "used": usdt.get("used", 0),
-            }
+            return await self._fetch_usdt_balance()
         except Exception as e:
             logger.error(f"Erreur fetch_balance: {e}")
             return {"total": 0, "free": 0, "used": 0}
 
+    def cached_balance(self, max_age: float = _BALANCE_REFRESH_SEC) -> dict | None:
+        """Balance rafraichie en tache de fond si elle a moins de max_age secondes, sinon None."""
+        if self._balance_cache is None or time.monotonic() - self._balance_cache[0] > max_age:
+            return None
+        return dict(self._balance_cache[1])
+
+    def invalidate_balance(self):
+        """A appeler apres un ordre : la prochaine lecture refera un fetch_balance."""
+        self._balance_epoch += 1
+        self._balance_cache = None
+
+    def start_balance_refresh(self):
+        if self._balance_task is not None and not self._balance_task.done():
+            return
+        self._balance_task = asyncio.create_task(self._balance_loop())
+
+    async def _balance_loop(self):
+        """Garde la balance en cache : execute_signal la lit sans aller-retour avant l'ordre."""
+        while True:
+            try:
+                await self._fetch_usdt_balance()
+            except Exception as e:
+                logger.debug("Rafraichissement balance: %s", e)
+            await asyncio.sleep(_BALANCE_REFRESH_SEC)
+
+    def margin_state(self, symbol: str, position_type: int) -> tuple[int, int] | None:
+        """(openType, leverage) deja appliques a ce symbole / sens pendant la session, sinon None."""
+        return self._margin_state.get((symbol, position_type))
+
+    def set_margin_state(self, symbol: str, position_type: int, open_type: int, leverage: int):
+        """A appeler une fois set_leverage accepte par l'exchange."""
+        self._margin_state[(symbol, position_type)] = (open_type, leverage)
+
     def get_oi_change_pct(self, symbol: str, current_oi: float) -> float:
         """Calcule le % de changement de l'OI par rapport a la derniere valeur."""
         prev_oi = self._last_oi.get(symbol, 0)
@@ -147,8 +393,17 @@ class MarketData:
             return 0.0
         return ((current_oi - prev_oi) / prev_oi) * 100
 
-    async def fetch_all_data(self, symbol: str, timeframes: list[str]) -> dict:
-        """Recupere toutes les donnees pour une paire et ses timeframes."""
+    async def fetch_all_data(
+        self,
+        symbol: str,
+        timeframes: list[str],
+        ticker: dict | None = None,
+        funding_rate: float | None = None,
+    ) -> dict:
+        """
+        Recupere toutes les donnees pour une paire et ses timeframes.
+        ticker / funding_rate deja obtenus par un appel batch ne sont pas redemandes.
+        """
         data = {
             "symbol": symbol,
             "timestamp": datetime.utcnow().isoformat(),
@@ -160,30 +415,66 @@ class MarketData:
             "ticker": {},
         }
 
-        for tf in timeframes:
-            data["ohlcv"][tf] = await self.fetch_ohlcv(symbol, tf)
+        # Requetes independantes lancees en parallele (chaque fetch_* gere ses propres erreurs)
+        ohlcv_list, orderbook, funding_rate, open_interest, ticker = await asyncio.gather(
+            asyncio.gather(*(self.fetch_ohlcv(symbol, tf) for tf in timeframes)),
+            self.fetch_orderbook(symbol),
+            self.fetch_funding_rate(symbol) if funding_rate is None else _resolved(funding_rate),
+            self.fetch_open_interest(symbol),
+            self.fetch_ticker(symbol) if ticker is None else _resolved(ticker),
+        )
 
-        data["orderbook"] = await self.fetch_orderbook(symbol)
-        data["funding_rate"] = await self.fetch_funding_rate(symbol)
-        data["open_interest"] = await self.fetch_open_interest(symbol)
-        data["oi_change_pct"] = self.get_oi_change_pct(symbol, data["open_interest"])
-        data["ticker"] = await self.fetch_ticker(symbol)
+        data["ohlcv"] = dict(zip(timeframes, ohlcv_list))
+        data["orderbook"] = orderbook
+        data["funding_rate"] = funding_rate
+        data["open_interest"] = open_interest
+        data["oi_change_pct"] = self.get_oi_change_pct(symbol, open_interest)
+        data["ticker"] = ticker
 
         return data
 
-    async def fetch_all_data_batch(self, symbols: list[str], timeframes: list[str]) -> dict[str, dict]:
-        """Recupere les donnees pour toutes les paires en parallele."""
-        import asyncio
-        tasks = {symbol: self.fetch_all_data(symbol, timeframes) for symbol in symbols}
-        results = await asyncio.gather(*tasks.values(), return_exceptions=True)
-        data = {}
-        for symbol, result in zip(tasks.keys(), results):
-            if isinstance(result, Exception):
-                logger.error(f"Erreur fetch_all_data_batch {symbol}: {result}")
-                data[symbol] = None
-            else:
-                data[symbol] = result
-        return data
+    async def fetch_all_data_batch(self, symbols: list[str], timeframes: list[str]):
+        """
+        Recupere les donnees pour toutes les paires en parallele.
+        Generateur asynchrone : (symbol, data) dans l'ordre d'arrivee, data = None en cas d'erreur,
+        pour que l'analyse d'une paire commence sans attendre la plus lente.
+        """
+        # Tickers et funding rates : un appel batch pour toutes les paires au lieu d'un par paire
+        tickers, funding_rates = await asyncio.gather(
+            self.fetch_all_tickers(symbols),
+            self.fetch_all_funding_rates(symbols),
+        )
+
+        async def _fetch_one(symbol: str):
+            try:
+                return symbol, await self.fetch_all_data(
+                    symbol, timeframes, ticker=tickers.get(symbol), funding_rate=funding_rates.get(symbol),
+                )
+            except Exception as e:
+                logger.error(f"Erreur fetch_all_data_batch {symbol}: {e}")
+                return symbol, None
+
+        tasks = [asyncio.create_task(_fetch_one(symbol)) for symbol in symbols]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Consommateur interrompu : ne pas laisser de requetes orphelines
+            for task in tasks:
+                task.cancel()
+
+
+def _fresh(cache: dict, symbol: str, max_age: float = _BULK_CACHE_TTL_SEC):
+    """Valeur en cache si elle a moins de max_age secondes, sinon None."""
+    entry = cache.get(symbol)
+    if entry is None or time.monotonic() - entry[0] > max_age:
+        return None
+    return entry[1]
+
+
+async def _resolved(value):
+    """Valeur deja connue presentee comme une coroutine, pour asyncio.gather."""
+    return value
 
 
 # Singleton
@@ -3,15 +3,16 @@ Market Regime Detection : classifie le marche en TRENDING / RANGING / VOLATILE.
 Utilise les indicateurs deja calcules (ADX, BB bandwidth, ATR ratio).
 """
 import logging
-import math
+
+import numpy as np
+import pandas as pd
 
 logger = logging.getLogger(__name__)
 
 
 def _safe(val, default=0):
-    if val is None:
-        return default
-    if isinstance(val, float) and math.isnan(val):
+    # val != val : test NaN sans isinstance ni appel a math.isnan
+    if val is None or val != val:
         return default
     return val
 
@@ -19,54 +20,92 @@ def _safe(val, default=0):
 def detect_regime(indicators: dict) -> dict:
     """
     Classifie le regime de marche a partir des indicateurs.
-    Returns: {"regime": str, "confidence": float, "details": str}
+    Returns: {"regime": str, "confidence": float, "atr_ratio": float}, + "details": str en DEBUG
     """
     adx_val = _safe(indicators.get("last_adx"), 0)
     bb_bw = _safe(indicators.get("last_bb_bandwidth"), 0)
     atr_val = _safe(indicators.get("last_atr"), 0)
-    atr_series = indicators.get("atr")
-    atr_mean = 0
-    if atr_series is not None and len(atr_series) >= 14:
-        atr_mean = _safe(atr_series.tail(50).mean(), 0)
+    atr_mean = indicators.get("last_atr_mean50")
+    if atr_mean is None:
+        # Bundle sans moyenne precalculee : calcul a partir de la Series ATR
+        atr_series = indicators.get("atr")
+        atr_mean = 0
+        if atr_series is not None and len(atr_series) >= 14:
+            atr_mean = atr_series.tail(50).mean()
+    atr_mean = _safe(atr_mean, 0)
     atr_ratio = atr_val / atr_mean if atr_mean > 0 else 1.0
 
     # VOLATILE : ATR ratio > 2.0 OU BB bandwidth > 5.0
     if atr_ratio > 2.0 or bb_bw > 5.0:
+        regime = "volatile"
         confidence = min(1.0, max(atr_ratio / 3.0, bb_bw / 8.0))
-        return {
-            "regime": "volatile",
-            "confidence": round(confidence, 2),
-            "details": f"ATR ratio {atr_ratio:.2f}, BB bw {bb_bw:.2f}%",
-            "atr_ratio": round(atr_ratio, 3),
-        }
+        details_fmt = "ATR ratio {atr_ratio:.2f}, BB bw {bb_bw:.2f}%"
 
     # TRENDING : ADX >= 25 + BB bandwidth >= 1.5
-    if adx_val >= 25 and bb_bw >= 1.5:
+    elif adx_val >= 25 and bb_bw >= 1.5:
+        regime = "trending"
         confidence = min(1.0, (adx_val - 20) / 30)
-        return {
-            "regime": "trending",
-            "confidence": round(confidence, 2),
-            "details": f"ADX {adx_val:.1f}, BB bw {bb_bw:.2f}%",
-            "atr_ratio": round(atr_ratio, 3),
-        }
+        details_fmt = "ADX {adx:.1f}, BB bw {bb_bw:.2f}%"
 
     # RANGING : ADX < 20 + BB bandwidth < 2.0
-    if adx_val < 20 and bb_bw < 2.0:
+    elif adx_val < 20 and bb_bw < 2.0:
+        regime = "ranging"
         confidence = min(1.0, (20 - adx_val) / 15)
-        return {
-            "regime": "ranging",
-            "confidence": round(confidence, 2),
-            "details": f"ADX {adx_val:.1f}, BB bw {bb_bw:.2f}%",
-            "atr_ratio": round(atr_ratio, 3),
-        }
+        details_fmt = "ADX {adx:.1f}, BB bw {bb_bw:.2f}%"
 
     # Mixed / unclear
-    return {
-        "regime": "trending" if adx_val >= 22 else "ranging",
-        "confidence": 0.3,
-        "details": f"ADX {adx_val:.1f}, BB bw {bb_bw:.2f}% (mixed)",
+    else:
+        regime = "trending" if adx_val >= 22 else "ranging"
+        confidence = 0.3
+        details_fmt = "ADX {adx:.1f}, BB bw {bb_bw:.2f}% (mixed)"
+
+    result = {
+        "regime": regime,
+        "confidence": round(confidence, 2),
         "atr_ratio": round(atr_ratio, 3),
     }
+    # Texte de diagnostic : formate seulement en DEBUG (aucun appelant ne le lit)
+    if logger.isEnabledFor(logging.DEBUG):
+        result["details"] = details_fmt.format(adx=adx_val, bb_bw=bb_bw, atr_ratio=atr_ratio)
+    return result
+
+
+def detect_regime_batch(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Version vectorisee de detect_regime pour N paires a la fois.
+    Colonnes attendues : adx, bb_bw, atr_ratio (NaN traites comme dans detect_regime ;
+    atr_ratio NaN = moyenne ATR absente ou nulle, soit 1.0).
+    Accord avec detect_regime verifie par tests/test_market_regime.py.
+    Returns: DataFrame (meme index) avec regime, confidence, atr_ratio.
+    """
+    adx = df["adx"].fillna(0).to_numpy(dtype=np.float64)
+    bb_bw = df["bb_bw"].fillna(0).to_numpy(dtype=np.float64)
+    atr_ratio = df["atr_ratio"].fillna(1.0).to_numpy(dtype=np.float64)
+
+    # Memes seuils et meme ordre de priorite que la cascade de detect_regime
+    volatile = (atr_ratio > 2.0) | (bb_bw > 5.0)
+    trending = ~volatile & (adx >= 25) & (bb_bw >= 1.5)
+    ranging = ~volatile & ~trending & (adx < 20) & (bb_bw < 2.0)
+    mixed_trending = adx >= 22
+
+    regime = np.select(
+        [volatile, trending, ranging, mixed_trending],
+        ["volatile", "trending", "ranging", "trending"],
+        default="ranging",
+    )
+    confidence = np.select(
+        [volatile, trending, ranging],
+        [
+            np.minimum(1.0, np.maximum(atr_ratio / 3.0, bb_bw / 8.0)),
+            np.minimum(1.0, (adx - 20) / 30),
+            np.minimum(1.0, (20 - adx) / 15),
+        ],
+        default=0.3,
+    )
+    return pd.DataFrame(
+        {"regime": regime, "confidence": confidence.round(2), "atr_ratio": atr_ratio.round(3)},
+        index=df.index,
+    )
 
 
 def regime_score_modifier(regime: str, setup_type: str, confidence: float = 1.0) -> int:
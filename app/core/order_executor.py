@@ -2,7 +2,9 @@
 Order Executor : place les ordres sur MEXC Futures via ccxt.
 Verifie le prix actuel, puis: Entree market + Stop Loss + Take Profits (3 niveaux).
 """
+import asyncio
 import logging
+from ccxt.base.decimal_to_precision import TICK_SIZE
 from app.core.market_data import market_data
 from app.core.risk_manager import calculate_position_size
 
@@ -11,6 +13,32 @@ logger = logging.getLogger(__name__)
 # Max deviation autorisee entre le prix du signal et le prix actuel
 MAX_PRICE_DEVIATION_PCT = 0.3
 
+# Parametres communs des ordres SL / TP (stop market reduceOnly declenche au mark price)
+EXIT_ORDER_PARAMS = {"reduceOnly": True, "triggerType": "mark_price"}
+
+
+def _split_tp_quantities(exchange, symbol: str, quantity: float, close_pcts: list) -> list[float]:
+    """
+    Decoupe la quantite en 3 tranches TP.
+    Calcul en lots entiers du pas de quantite du marche (somme exacte), sinon en flottants arrondis.
+    """
+    try:
+        precision = exchange.market(symbol)["precision"]["amount"]
+        step = float(precision) if exchange.precisionMode == TICK_SIZE else 10.0 ** -precision
+    except Exception:
+        step = None
+
+    if not step or step <= 0:
+        tp_qtys = [round(quantity * close_pct / 100, 6) for close_pct in close_pcts[:2]]
+        tp_qtys.append(quantity - tp_qtys[0] - tp_qtys[1])  # derniere tranche = tout le reste
+        return tp_qtys
+
+    # ccxt tronque la quantite d'entree au pas : meme troncature ici
+    units = int(quantity / step + 1e-9)
+    tp_units = [int(units * close_pct // 100) for close_pct in close_pcts[:2]]
+    tp_units.append(units - tp_units[0] - tp_units[1])  # derniere tranche = tout le reste
+    return [round(u * step, 12) for u in tp_units]
+
 
 async def execute_signal(signal: dict, margin_usdt: float = None, order_type: str = "market", position_monitor=None) -> dict:
     """
@@ -39,9 +67,20 @@ async def execute_signal(signal: dict, margin_usdt: float = None, order_type: st
     exit_side = "sell" if direction == "long" else "buy"
 
     try:
-        # --- 0. Verifier le prix actuel ---
-        ticker = await market_data.fetch_ticker(symbol)
-        current_price = ticker.get("price", 0)
+        # --- 0. Verifier le prix actuel (balance recuperee en meme temps pour l'etape 2) ---
+        async def _current_price() -> float:
+            # Prix pousse il y a moins de 500 ms : pas de requete ; sinon ticker REST frais
+            price = market_data.last_price(symbol)
+            if price is None:
+                ticker = await market_data.fetch_ticker(symbol, max_age=0)
+                price = ticker.get("price", 0)
+            return price
+
+        async def _balance() -> dict:
+            # Balance rafraichie en tache de fond, sinon fetch
+            return market_data.cached_balance() or await market_data.fetch_balance()
+
+        current_price, balance = await asyncio.gather(_current_price(), _balance())
         if current_price <= 0:
             return {"success": False, "error": "Prix actuel indisponible"}
 
@@ -93,22 +132,17 @@ async def execute_signal(signal: dict, margin_usdt: float = None, order_type: st
         position_type = 1 if direction == "long" else 2  # 1=long, 2=short
         open_type = 1  # 1=isolated
 
-        try:
-            await exchange.set_margin_mode("isolated", symbol, params={
+        # Deja configure (meme marge, meme levier) lors d'un ordre precedent : pas de requete
+        if market_data.margin_state(symbol, position_type) != (open_type, leverage):
+            # openType dans set_leverage pose aussi le mode de marge isole (pas de set_margin_mode)
+            await exchange.set_leverage(leverage, symbol, params={
                 "openType": open_type,
                 "positionType": position_type,
             })
-        except Exception as e:
-            logger.debug(f"set_margin_mode: {e}")
-
-        await exchange.set_leverage(leverage, symbol, params={
-            "openType": open_type,
-            "positionType": position_type,
-        })
-        logger.info(f"Leverage {leverage}x set pour {symbol} ({direction})")
+            market_data.set_margin_state(symbol, position_type, open_type, leverage)
+            logger.info(f"Leverage {leverage}x set pour {symbol} ({direction})")
 
         # --- 2. Taille de position ---
-        balance = await market_data.fetch_balance()
         total_balance = balance.get("free", 0)
 
         if margin_usdt and margin_usdt > 0:
@@ -148,63 +182,51 @@ async def execute_signal(signal: dict, margin_usdt: float = None, order_type: st
         if order_type == "limit":
             # LIMIT : ordre en attente au prix du signal
             entry_order = await exchange.create_limit_order(symbol, side, quantity, entry_price)
+            market_data.invalidate_balance()
             entry_id = entry_order.get("id")
             actual_entry = entry_price
             logger.info(f"LIMIT {side.upper()} {quantity} {symbol} @ {entry_price} (order {entry_id})")
         else:
             # MARKET : execution immediate
             entry_order = await exchange.create_market_order(symbol, side, quantity)
+            market_data.invalidate_balance()
             entry_id = entry_order.get("id")
             actual_entry = entry_order.get("average") or entry_order.get("price") or entry_price
             logger.info(f"MARKET {side.upper()} {quantity} {symbol} @ {actual_entry} (order {entry_id})")
 
-        # --- 4. Stop Loss ---
-        sl_order_id = None
-        try:
-            sl_order = await exchange.create_order(
-                symbol, "market", exit_side, quantity, None,
-                params={
-                    "stopPrice": stop_loss,
-                    "reduceOnly": True,
-                    "triggerType": "mark_price",
-                }
-            )
-            sl_order_id = sl_order.get("id")
-            logger.info(f"SL set @ {stop_loss} (order {sl_order_id})")
-        except Exception as e:
-            logger.error(f"Erreur SL: {e}")
-
-        # --- 5. Take Profits ---
+        # --- 4/5. Stop Loss + Take Profits (ordres independants, envoyes en parallele) ---
         tp_close_pcts = [
             signal.get("tp1_close_pct", 40),
             signal.get("tp2_close_pct", 30),
             signal.get("tp3_close_pct", 30),
         ]
         tp_prices = [tp1, tp2, tp3]
-        tp_order_ids = []
-
-        remaining = quantity
-        for i, (tp_price, close_pct) in enumerate(zip(tp_prices, tp_close_pcts)):
-            if i < 2:
-                tp_qty = round(quantity * close_pct / 100, 6)
-            else:
-                tp_qty = remaining  # derniere tranche = tout le reste
-            remaining -= tp_qty
+        tp_qtys = _split_tp_quantities(exchange, symbol, quantity, tp_close_pcts)
 
+        async def _place_exit(label: str, qty: float, trigger_price: float):
+            """Ordre stop market reduceOnly ; renvoie l'id, ou None si l'ordre a echoue."""
             try:
-                tp_order = await exchange.create_order(
-                    symbol, "market", exit_side, tp_qty, None,
-                    params={
-                        "stopPrice": tp_price,
-                        "reduceOnly": True,
-                        "triggerType": "mark_price",
-                    }
+                order = await exchange.create_order(
+                    symbol, "market", exit_side, qty, None,
+                    params={"stopPrice": trigger_price, **EXIT_ORDER_PARAMS},
                 )
-                tp_order_ids.append(tp_order.get("id"))
-                logger.info(f"TP{i+1} set @ {tp_price} qty={tp_qty} (order {tp_order.get('id')})")
             except Exception as e:
-                logger.error(f"Erreur TP{i+1}: {e}")
-                tp_order_ids.append(None)
+                logger.error(f"Erreur {label}: {e}")
+                return None
+            order_id = order.get("id")
+            if label == "SL":
+                logger.info(f"SL set @ {trigger_price} (order {order_id})")
+            else:
+                logger.info(f"{label} set @ {trigger_price} qty={qty} (order {order_id})")
+            return order_id
+
+        sl_order_id, *tp_order_ids = await asyncio.gather(
+            _place_exit("SL", quantity, stop_loss),
+            *(
+                _place_exit(f"TP{i+1}", tp_qty, tp_price)
+                for i, (tp_price, tp_qty) in enumerate(zip(tp_prices, tp_qtys))
+            ),
+        )
 
         result_dict = {
             "success": True,
@@ -6,62 +6,181 @@ Whale detection + aggressive ratio.
 V4 only.
 """
 import asyncio
-import json
 import logging
 import statistics
+import time
 from collections import deque
-from datetime import datetime
+from operator import itemgetter
 
+import numpy as np
+import orjson
 import websockets
 
 logger = logging.getLogger(__name__)
 
 WS_URL = "wss://contract.mexc.com/edge"
+MAX_TRADES = 5000  # Trades conserves par symbole
+
+# Champs d'un deal MEXC push.deal : prix, volume, sens (1=buy, 2=sell), timestamp ms
+_deal_fields = itemgetter("p", "v", "T", "t")
+
+
+class _TradeBuffer:
+    """
+    Trades d'un symbole en colonnes NumPy (ts, volume, is_buy, price) + volumes achat / vente cumules.
+    Garde les maxlen derniers trades ; itere en tuples (ts, volume, is_buy, price) comme l'ancien deque.
+    Les lignes s'ajoutent en fin de tableau ; a capacite pleine, les maxlen dernieres sont recopiees en tete.
+    """
+    __slots__ = ("maxlen", "ts", "vol", "is_buy", "price", "buy_cum", "sell_cum", "n")
+
+    def __init__(self, maxlen: int = MAX_TRADES):
+        self.maxlen = maxlen
+        capacity = 2 * maxlen
+        self.ts = np.empty(capacity, dtype=np.float64)
+        self.vol = np.empty(capacity, dtype=np.float64)
+        self.is_buy = np.empty(capacity, dtype=np.bool_)
+        self.price = np.empty(capacity, dtype=np.float64)
+        # buy_cum[k] = volume achete sur les lignes [0, k) ; volume d'une fenetre [i, n) = cum[n] - cum[i]
+        self.buy_cum = np.zeros(capacity + 1, dtype=np.float64)
+        self.sell_cum = np.zeros(capacity + 1, dtype=np.float64)
+        self.n = 0  # lignes ecrites ; les trades gardes sont [max(0, n - maxlen), n)
+
+    def _start(self) -> int:
+        return max(0, self.n - self.maxlen)
+
+    def __len__(self) -> int:
+        return self.n - self._start()
+
+    def __iter__(self):
+        start, n = self._start(), self.n
+        return zip(
+            self.ts[start:n].tolist(),
+            self.vol[start:n].tolist(),
+            self.is_buy[start:n].tolist(),
+            self.price[start:n].tolist(),
+        )
+
+    def _compact(self):
+        keep = slice(self.n - self.maxlen, self.n)
+        for col in (self.ts, self.vol, self.is_buy, self.price):
+            col[:self.maxlen] = col[keep]
+        buys = np.where(self.is_buy[:self.maxlen], self.vol[:self.maxlen], 0.0)
+        sells = self.vol[:self.maxlen] - buys
+        np.cumsum(buys, out=self.buy_cum[1:self.maxlen + 1])
+        np.cumsum(sells, out=self.sell_cum[1:self.maxlen + 1])
+        self.n = self.maxlen
+
+    def append(self, ts: float, volume: float, is_buy: bool, price: float):
+        if self.n == len(self.ts):
+            self._compact()
+        n = self.n
+        if n > self._start() and ts < self.ts[n - 1]:
+            # Trade en retard (snapshot rejoue, horloge locale) : insere a sa place pour garder ts trie
+            self._insert(ts, volume, is_buy, price)
+            return
+        self.ts[n] = ts
+        self.vol[n] = volume
+        self.is_buy[n] = is_buy
+        self.price[n] = price
+        if is_buy:
+            self.buy_cum[n + 1] = self.buy_cum[n] + volume
+            self.sell_cum[n + 1] = self.sell_cum[n]
+        else:
+            self.buy_cum[n + 1] = self.buy_cum[n]
+            self.sell_cum[n + 1] = self.sell_cum[n] + volume
+        self.n = n + 1
+
+    def _insert(self, ts: float, volume: float, is_buy: bool, price: float):
+        """Insere une ligne apres les trades de meme ts puis recalcule les cumuls a partir de celle-ci."""
+        start, n = self._start(), self.n
+        pos = start + int(np.searchsorted(self.ts[start:n], ts, side="right"))
+        for col, value in ((self.ts, ts), (self.vol, volume), (self.is_buy, is_buy), (self.price, price)):
+            col[pos + 1:n + 1] = col[pos:n]
+            col[pos] = value
+        buys = np.where(self.is_buy[pos:n + 1], self.vol[pos:n + 1], 0.0)
+        sells = self.vol[pos:n + 1] - buys
+        self.buy_cum[pos + 1:n + 2] = self.buy_cum[pos] + np.cumsum(buys)
+        self.sell_cum[pos + 1:n + 2] = self.sell_cum[pos] + np.cumsum(sells)
+        self.n = n + 1
+
+    def index_at(self, cutoff: float, side: str = "left") -> int:
+        """
+        Premiere ligne avec ts >= cutoff (side="left") ou ts > cutoff (side="right").
+        append() insere les trades en retard a leur place, les ts sont donc tries.
+        """
+        start = self._start()
+        return start + int(np.searchsorted(self.ts[start:self.n], cutoff, side=side))
+
+    def delta(self, i: int, j: int) -> float:
+        """Volume signe (achats - ventes) des lignes [i, j)."""
+        return float((self.buy_cum[j] - self.buy_cum[i]) - (self.sell_cum[j] - self.sell_cum[i]))
+
+    def window_volumes(self, cutoff: float) -> tuple[float, float]:
+        """(buy_vol, sell_vol) des trades avec ts >= cutoff."""
+        i, n = self.index_at(cutoff), self.n
+        return float(self.buy_cum[n] - self.buy_cum[i]), float(self.sell_cum[n] - self.sell_cum[i])
+
+    def last_ts(self) -> float:
+        return float(self.ts[self.n - 1]) if self.n else 0
 
 
 class OrderFlowTracker:
     def __init__(self, symbols: list[str]):
         self.symbols = symbols
         self.running = False
-        self._ws_tasks: dict[str, asyncio.Task] = {}
+        self._ws_task: asyncio.Task | None = None  # une seule connexion pour tous les symboles
 
-        # Per-symbol rolling trade data: deque of (timestamp, volume, is_buy, price)
-        self._trades: dict[str, deque] = {s: deque(maxlen=5000) for s in symbols}
+        # Per-symbol rolling trade data: columns (timestamp, volume, is_buy, price)
+        self._trades: dict[str, _TradeBuffer] = {s: _TradeBuffer() for s in symbols}
 
         # Cached deltas
         self._delta_cache: dict[str, dict] = {}
         self._last_prices: dict[str, float] = {}
 
+        # Symbole MEXC et trame sub.deal calcules une fois (reutilises a chaque reconnexion)
+        self._mexc_symbols: dict[str, str] = {
+            s: s.split(":")[0].replace("-", "_").replace("/", "_") for s in symbols
+        }
+        # Trame texte : orjson renvoie des bytes, que websockets enverrait en binaire
+        self._sub_frames: dict[str, str] = {
+            s: orjson.dumps({"method": "sub.deal", "param": {"symbol": m}}).decode()
+            for s, m in self._mexc_symbols.items()
+        }
+        # Routage des push.deal (champ "symbol" MEXC) vers le symbole suivi
+        self._by_mexc_symbol: dict[str, str] = {m: s for s, m in self._mexc_symbols.items()}
+
     async def start(self):
         self.running = True
-        for symbol in self.symbols:
-            self._ws_tasks[symbol] = asyncio.create_task(self._ws_stream(symbol))
+        self._ws_task = asyncio.create_task(self._ws_stream())
         logger.info(f"OrderFlowTracker started for {len(self.symbols)} symbols")
 
     async def stop(self):
         self.running = False
-        for task in self._ws_tasks.values():
-            task.cancel()
-        self._ws_tasks.clear()
+        if self._ws_task is not None:
+            self._ws_task.cancel()
+            self._ws_task = None
         logger.info("OrderFlowTracker stopped")
 
-    async def _ws_stream(self, symbol: str):
-        mexc_symbol = symbol.split(":")[0].replace("-", "_").replace("/", "_")
-
+    async def _ws_stream(self):
+        """Un seul WebSocket : un sub.deal par symbole, push.deal aiguilles par leur champ symbol."""
         while self.running:
             try:
                 async with websockets.connect(WS_URL) as ws:
-                    await ws.send(json.dumps({
-                        "method": "sub.deal",
-                        "param": {"symbol": mexc_symbol}
-                    }))
+                    for sub_frame in self._sub_frames.values():
+                        await ws.send(sub_frame)
 
                     ping_task = asyncio.create_task(self._keepalive(ws))
                     try:
                         async for raw in ws:
                             if not self.running:
                                 break
-                            msg = json.loads(raw)
+                            # Pong, ack d'abonnement... : ecartes sans parse JSON
+                            if (b"push.deal" if isinstance(raw, bytes) else "push.deal") not in raw:
+                                continue
+                            msg = orjson.loads(raw)
+                            symbol = self._by_mexc_symbol.get(msg.get("symbol"))
+                            if symbol is None:
+                                continue
                             if msg.get("channel") == "push.deal" and msg.get("data"):
                                 deals = msg["data"]
                                 if isinstance(deals, list):
@@ -74,7 +193,7 @@ class OrderFlowTracker:
 
             except Exception as e:
                 if self.running:
-                    logger.warning(f"OrderFlow WS {symbol} error: {e}, reconnecting...")
+                    logger.warning(f"OrderFlow WS error: {e}, reconnecting...")
                     await asyncio.sleep(5)
 
     async def _keepalive(self, ws):
@@ -87,32 +206,33 @@ class OrderFlowTracker:
 
     def _process_deal(self, symbol: str, deal: dict):
         try:
-            price = float(deal.get("p", 0))
-            volume = float(deal.get("v", 0) or deal.get("q", 0))
+            try:
+                p, v, side, t = _deal_fields(deal)
+            except KeyError:
+                # Champ manquant : lecture cle par cle avec valeurs par defaut
+                p, v, side, t = deal.get("p", 0), deal.get("v", 0), deal.get("T", 0), deal.get("t")
+            price = float(p)
+            volume = float(v or deal.get("q", 0))
             # MEXC: T=1 is buy (taker buy), T=2 is sell
-            is_buy = deal.get("T", 0) == 1
-            ts = float(deal.get("t", 0)) / 1000 if deal.get("t") else datetime.utcnow().timestamp()
+            is_buy = side == 1
+            trades = self._trades[symbol]
+            # Sans horodatage : dernier ts exchange connu plutot que l'horloge locale
+            ts = float(t) / 1000 if t else (trades.last_ts() or time.time())
 
             if price > 0 and volume > 0:
-                self._trades[symbol].append((ts, volume, is_buy, price))
+                trades.append(ts, volume, is_buy, price)
                 self._last_prices[symbol] = price
         except Exception:
             pass
 
     def get_delta(self, symbol: str, window_seconds: int = 60) -> dict:
         """Get buy/sell volume delta for a rolling window."""
-        now = datetime.utcnow().timestamp()
+        now = time.time()
         cutoff = now - window_seconds
-        trades = self._trades.get(symbol, deque())
+        trades = self._trades.get(symbol)
 
-        buy_vol = 0
-        sell_vol = 0
-        for ts, vol, is_buy, _price in trades:
-            if ts >= cutoff:
-                if is_buy:
-                    buy_vol += vol
-                else:
-                    sell_vol += vol
+        # Recherche dichotomique de la fenetre + difference de sommes cumulees
+        buy_vol, sell_vol = trades.window_volumes(cutoff) if trades is not None else (0, 0)
 
         total = buy_vol + sell_vol
         delta = buy_vol - sell_vol
@@ -139,34 +259,31 @@ class OrderFlowTracker:
         Detect CVD divergence: price going up but CVD going down (or vice versa).
         Returns signal strength (-1.0 to 1.0).
         """
-        trades = self._trades.get(symbol, deque())
-        if len(trades) < 20:
+        trades = self._trades.get(symbol)
+        if trades is None or len(trades) < 20:
             return {"divergence": 0, "signal": "neutral", "confidence": 0}
 
-        now = datetime.utcnow().timestamp()
+        now = time.time()
 
-        # Compare 5m windows: recent vs previous
+        # Compare 5m windows: recent [mid, ...) vs previous [cutoff, mid)
         mid = now - 300
         cutoff = now - 600
+        if trades.last_ts() < mid:  # aucun trade recent : inutile de chercher les fenetres
+            return {"divergence": 0, "signal": "neutral", "confidence": 0}
+        i_cut = trades.index_at(cutoff)
+        i_mid = trades.index_at(mid)
+        n = trades.n
 
-        recent_delta = 0
-        prev_delta = 0
-        recent_prices = []
-        prev_prices = []
-
-        for ts, vol, is_buy, price in trades:
-            if ts >= mid:
-                recent_delta += vol if is_buy else -vol
-                recent_prices.append(price)
-            elif ts >= cutoff:
-                prev_delta += vol if is_buy else -vol
-                prev_prices.append(price)
-
-        if not recent_prices or not prev_prices:
+        if i_mid == n or i_cut == i_mid:
             return {"divergence": 0, "signal": "neutral", "confidence": 0}
 
+        recent_delta = trades.delta(i_mid, n)
+        prev_delta = trades.delta(i_cut, i_mid)
+        last_price = float(trades.price[n - 1])
+        first_prev_price = float(trades.price[i_cut])
+
         delta_change = recent_delta - prev_delta
-        price_change = (recent_prices[-1] - prev_prices[0]) / max(prev_prices[0], 1e-8)
+        price_change = (last_price - first_prev_price) / max(first_prev_price, 1e-8)
 
         # Bearish divergence: price rising but CVD falling
         if price_change > 0.001 and delta_change < 0 and recent_delta < 0:
@@ -185,31 +302,27 @@ class OrderFlowTracker:
         Enhanced CVD divergence: compare actual price movement vs CVD over two 5min windows.
         Returns signal + confidence (0-1).
         """
-        trades = self._trades.get(symbol, deque())
-        if len(trades) < 30:
+        trades = self._trades.get(symbol)
+        if trades is None or len(trades) < 30:
             return {"divergence": 0, "signal": "neutral", "confidence": 0}
 
-        now = datetime.utcnow().timestamp()
-        w1_start, w1_end = now - 600, now - 300
-        w2_start, w2_end = now - 300, now
-
-        w1_delta, w2_delta = 0, 0
-        w1_prices, w2_prices = [], []
-
-        for ts, vol, is_buy, price in trades:
-            if w1_start <= ts < w1_end:
-                w1_delta += vol if is_buy else -vol
-                w1_prices.append(price)
-            elif w2_start <= ts <= w2_end:
-                w2_delta += vol if is_buy else -vol
-                w2_prices.append(price)
+        now = time.time()
+        if trades.last_ts() < now - 300:  # fenetre recente vide
+            return {"divergence": 0, "signal": "neutral", "confidence": 0}
+        # w1 = [now-600, now-300), w2 = [now-300, now] en indices de lignes
+        i_w1 = trades.index_at(now - 600)
+        i_w2 = trades.index_at(now - 300)
+        i_end = trades.index_at(now, side="right")
 
-        if not w1_prices or not w2_prices:
+        if i_w1 == i_w2 or i_w2 == i_end:
             return {"divergence": 0, "signal": "neutral", "confidence": 0}
 
+        w1_delta = trades.delta(i_w1, i_w2)
+        w2_delta = trades.delta(i_w2, i_end)
+
         # Price direction
-        price_w1_avg = sum(w1_prices) / len(w1_prices)
-        price_w2_avg = sum(w2_prices) / len(w2_prices)
+        price_w1_avg = float(trades.price[i_w1:i_w2].mean())
+        price_w2_avg = float(trades.price[i_w2:i_end].mean())
         price_pct = (price_w2_avg - price_w1_avg) / max(price_w1_avg, 1e-8)
 
         # CVD direction
@@ -240,7 +353,7 @@ class OrderFlowTracker:
         Detect whale trades: trades > multiplier x median volume.
         Returns whale_pressure (-1 to +1), whale_count, whale_volume.
         """
-        now = datetime.utcnow().timestamp()
+        now = time.time()
         cutoff = now - window
         trades = self._trades.get(symbol, deque())
 
@@ -283,7 +396,7 @@ class OrderFlowTracker:
         Ratio taker buy / taker sell over window.
         >1 = buyers aggressive, <1 = sellers aggressive.
         """
-        now = datetime.utcnow().timestamp()
+        now = time.time()
         cutoff = now - window
         trades = self._trades.get(symbol, deque())
 
@@ -316,10 +429,10 @@ class OrderFlowTracker:
 
     def get_last_trade_ts(self, symbol: str) -> float:
         """Return timestamp of last trade, 0 if none."""
-        trades = self._trades.get(symbol, deque())
-        if not trades:
+        trades = self._trades.get(symbol)
+        if trades is None:
             return 0
-        return trades[-1][0]
+        return trades.last_ts()
 
     def get_flow_score(self, symbol: str) -> tuple[float, str]:
         """
@@ -3,7 +3,9 @@ Paper Trader : Execute automatiquement chaque signal en simulation.
 Portefeuille fictif avec suivi P&L en temps reel via les vrais prix MEXC.
 Accepte bot_version pour supporter V1 et V2 en parallele.
 """
+import asyncio
 import logging
+import time
 from datetime import datetime, timedelta
 from app.config import SETTINGS
 from app.database import (
@@ -18,6 +20,10 @@ logger = logging.getLogger(__name__)
 
 FIXED_MARGIN = 10.0  # 10$ fixe par trade
 MAX_OPEN = 5         # Max 5 positions simultanees
+PORTFOLIO_TTL_SEC = 2.0  # Lecture du portefeuille paper reutilisee entre signaux rapproches
+RECENT_TRADES_TTL_SEC = 5.0  # Derniers trades du circuit breaker (V4) reutilises entre signaux
+PAPER_WRITE_RETRY_SEC = 5.0  # Delai avant de reessayer une ecriture paper refusee par la base
+PAPER_WRITE_DRAIN_TIMEOUT_SEC = 30.0  # Attente max de la file d'ecritures a l'arret
 
 
 class PaperTrader:
@@ -25,9 +31,18 @@ class PaperTrader:
         self.bot_version = bot_version
         self.settings = settings or SETTINGS
         self._open_positions: dict[int, float] = {}  # pos_id -> margin
+        self._open_keys: dict[tuple[str, str], int] = {}  # (symbol, direction) -> pos_id
         self._position_monitor = None  # set later
         self._correlation_guard = None  # V4 only
         self._circuit_breaker_until = None  # V4 only: pause until datetime
+        self._portfolio_cache: tuple[float, dict] | None = None  # (monotonic, portfolio)
+        self._trades_cache: tuple[float, list] | None = None  # (monotonic, 20 derniers trades)
+        # Ecritures paper en base differees (write-behind), executees une a une par _drain
+        self._wq: asyncio.Queue | None = None
+        self._writer_task: asyncio.Task | None = None
+        self._db_lock = asyncio.Lock()  # ecriture + maj de _pending_reserve atomiques vis-a-vis des lectures
+        self._pending_reserve = 0.0  # marge reservee en memoire, pas encore ecrite en base
+        self._current_write: tuple | None = None  # element en cours d'ecriture (re-essais compris)
 
     def set_position_monitor(self, pm):
         self._position_monitor = pm
@@ -35,6 +50,96 @@ class PaperTrader:
     def set_correlation_guard(self, cg):
         self._correlation_guard = cg
 
+    async def _get_portfolio(self) -> dict:
+        """Portefeuille paper, relu en base au plus toutes les PORTFOLIO_TTL_SEC secondes."""
+        if self._portfolio_cache is not None and time.monotonic() - self._portfolio_cache[0] < PORTFOLIO_TTL_SEC:
+            return self._portfolio_cache[1]
+        async with self._db_lock:
+            portfolio = await get_paper_portfolio(self.bot_version)
+        self._portfolio_cache = (time.monotonic(), portfolio)
+        return portfolio
+
+    def _invalidate_portfolio(self):
+        self._portfolio_cache = None
+
+    async def _get_recent_trades(self) -> list:
+        """20 derniers trades du bot, relus en base au plus toutes les RECENT_TRADES_TTL_SEC secondes."""
+        if self._trades_cache is not None and time.monotonic() - self._trades_cache[0] < RECENT_TRADES_TTL_SEC:
+            return self._trades_cache[1]
+        trades = await get_trades(limit=20, bot_version=self.bot_version)
+        self._trades_cache = (time.monotonic(), trades)
+        return trades
+
+    def _enqueue_write(self, item: tuple):
+        """Met une ecriture paper en file ; le writer est lance au premier usage."""
+        if self._writer_task is None or self._writer_task.done():
+            self._wq = self._wq or asyncio.Queue()
+            self._writer_task = asyncio.create_task(self._drain())
+        self._wq.put_nowait(item)
+
+    async def _drain(self):
+        """Writer : ecrit les reservations / clotures paper dans l'ordre d'arrivee."""
+        while True:
+            item = await self._wq.get()
+            self._current_write = item
+            try:
+                await self._write(item)
+                self._current_write = None
+                if item[0] == "close":
+                    _, pnl_usd, _, _ = item
+                    portfolio = await self._get_portfolio()
+                    sign = "+" if pnl_usd >= 0 else ""
+                    logger.info(
+                        f"[{self.bot_version}] PAPER CLOSE: PnL {sign}{pnl_usd:.2f}$ | "
+                        f"Balance: ${portfolio['current_balance']:.2f} | "
+                        f"Win/Loss: {portfolio['wins']}/{portfolio['losses']}"
+                    )
+            except Exception as e:
+                logger.error(f"[{self.bot_version}] Erreur lecture portefeuille paper: {e}")
+            finally:
+                self._wq.task_done()
+
+    async def _write(self, item: tuple):
+        """
+        Ecrit un element de la file, en reessayant tant que la base refuse : les ecritures
+        suivantes attendent, l'ordre reservation -> cloture est donc preserve.
+        """
+        while True:
+            try:
+                async with self._db_lock:
+                    if item[0] == "reserve":
+                        _, margin = item
+                        await reserve_paper_margin(margin, self.bot_version)
+                        # Reservation en base : elle ne doit plus etre comptee en memoire
+                        self._pending_reserve -= margin
+                    else:
+                        _, pnl_usd, is_win, margin = item
+                        await update_paper_balance(pnl_usd, is_win, margin, self.bot_version)
+                    self._invalidate_portfolio()
+                return
+            except Exception as e:
+                logger.error(
+                    f"[{self.bot_version}] Erreur ecriture paper {item}: {e}, "
+                    f"nouvel essai dans {PAPER_WRITE_RETRY_SEC:.0f}s"
+                )
+                await asyncio.sleep(PAPER_WRITE_RETRY_SEC)
+
+    async def stop(self):
+        """Vide la file d'ecritures paper puis arrete le writer."""
+        if self._wq is not None and self._writer_task is not None and not self._writer_task.done():
+            try:
+                await asyncio.wait_for(self._wq.join(), PAPER_WRITE_DRAIN_TIMEOUT_SEC)
+            except asyncio.TimeoutError:
+                # Base toujours indisponible : on trace ce qui n'a pas pu etre ecrit
+                unwritten = [self._current_write] if self._current_write is not None else []
+                while not self._wq.empty():
+                    unwritten.append(self._wq.get_nowait())
+                    self._wq.task_done()
+                logger.error(f"[{self.bot_version}] Ecritures paper non appliquees a l'arret: {unwritten}")
+        if self._writer_task is not None:
+            self._writer_task.cancel()
+            self._writer_task = None
+
     async def start(self):
         """Initialise le portefeuille paper et enregistre le callback."""
         await init_paper_portfolio(100.0, self.bot_version)
@@ -65,16 +170,15 @@ class PaperTrader:
             max_pos = MAX_OPEN
 
         if len(self._open_positions) >= max_pos:
-            logger.debug(f"[{self.bot_version}] Paper: max positions ({max_pos}) atteint, skip {signal['symbol']}")
+            logger.debug("[%s] Paper: max positions (%s) atteint, skip %s", self.bot_version, max_pos, signal['symbol'])
             return False
 
         # Verifier qu'on n'a pas deja une position sur ce symbol/direction
         if self._position_monitor:
-            for pos_id, _ in self._open_positions.items():
-                cached = self._position_monitor._positions.get(pos_id, {})
-                if cached.get("symbol") == signal["symbol"] and cached.get("direction") == signal["direction"]:
-                    logger.debug(f"[{self.bot_version}] Paper: deja une position {signal['symbol']} {signal['direction']}")
-                    return False
+            pos_id = self._open_keys.get((signal["symbol"], signal["direction"]))
+            if pos_id is not None and pos_id in self._position_monitor._positions:
+                logger.debug("[%s] Paper: deja une position %s %s", self.bot_version, signal['symbol'], signal['direction'])
+                return False
 
         # V4 only: Anti-correlation guard: max N positions dans la meme direction
         if self.bot_version == "V4" and self._position_monitor:
@@ -100,8 +204,9 @@ class PaperTrader:
                     logger.info(f"[{self.bot_version}] {reason}")
                     return False
 
-        portfolio = await get_paper_portfolio(self.bot_version)
-        available = portfolio["current_balance"] - portfolio["reserved_margin"]
+        portfolio = await self._get_portfolio()
+        # Reservations en file comptees tout de suite : le disponible n'est jamais surestime
+        available = portfolio["current_balance"] - portfolio["reserved_margin"] - self._pending_reserve
 
         # V4 Sniper: $18 margin x 20x leverage
         if self.bot_version == "V4":
@@ -157,8 +262,10 @@ class PaperTrader:
         if pos_id is None:
             return False
 
-        await reserve_paper_margin(margin, self.bot_version)
+        self._pending_reserve += margin
+        self._enqueue_write(("reserve", margin))
         self._open_positions[pos_id] = margin
+        self._open_keys[(signal["symbol"], signal["direction"])] = pos_id
 
         logger.info(
             f"[{self.bot_version}] PAPER TRADE: {signal['direction'].upper()} {signal['symbol']} "
@@ -185,7 +292,7 @@ class PaperTrader:
             return None
 
         # Get recent trades
-        recent_trades = await get_trades(limit=20, bot_version=self.bot_version)
+        recent_trades = await self._get_recent_trades()
         if not recent_trades:
             return None
 
@@ -216,17 +323,16 @@ class PaperTrader:
 
     async def _on_position_closed(self, pos_id: int, pnl_usd: float):
         """Callback quand le position_monitor ferme une position."""
+        # Trade journalise avant ce callback : le circuit breaker doit le voir
+        self._trades_cache = None
         margin = self._open_positions.pop(pos_id, None)
         if margin is None:
             return
+        for key, key_pos_id in self._open_keys.items():
+            if key_pos_id == pos_id:
+                del self._open_keys[key]
+                break
 
         is_win = pnl_usd > 0
-        await update_paper_balance(pnl_usd, is_win, margin, self.bot_version)
-
-        portfolio = await get_paper_portfolio(self.bot_version)
-        sign = "+" if pnl_usd >= 0 else ""
-        logger.info(
-            f"[{self.bot_version}] PAPER CLOSE: PnL {sign}{pnl_usd:.2f}$ | "
-            f"Balance: ${portfolio['current_balance']:.2f} | "
-            f"Win/Loss: {portfolio['wins']}/{portfolio['losses']}"
-        )
+        # Ecriture + log de cloture faits par le writer
+        self._enqueue_write(("close", pnl_usd, is_win, margin))
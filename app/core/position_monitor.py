@@ -9,6 +9,7 @@ Accepte bot_version pour supporter V1 et V2 en parallele.
 import asyncio
 import json
 import logging
+from collections import defaultdict
 from datetime import datetime
 
 import websockets
@@ -39,6 +40,7 @@ class PositionMonitor:
         self.settings = settings
         self.running = False
         self._positions: dict[int, dict] = {}
+        self._by_symbol: defaultdict[str, set[int]] = defaultdict(set)  # symbol -> pos_ids (ticks WS)
         self._ws_tasks: dict[str, asyncio.Task] = {}
         self._processing: set = set()
         self._on_close_callbacks: list = []
@@ -128,6 +130,7 @@ class PositionMonitor:
         pos_data["sl_hit"] = 0
 
         self._positions[pos_id] = pos_data
+        self._by_symbol[signal["symbol"]].add(pos_id)
         logger.info(f"[{self.bot_version}] Position enregistree: {signal['symbol']} {signal['direction']} qty={result['quantity']} (id={pos_id})")
 
         self._ensure_ws(signal["symbol"])
@@ -196,8 +199,9 @@ class PositionMonitor:
         )
 
     async def _on_price_tick(self, symbol: str, price: float):
-        for pos_id, pos in list(self._positions.items()):
-            if pos["symbol"] != symbol or pos.get("state") == "closed":
+        for pos_id in list(self._by_symbol.get(symbol, ())):
+            pos = self._positions.get(pos_id)
+            if pos is None or pos.get("state") == "closed":
                 continue
             if pos_id in self._processing:
                 continue
@@ -212,135 +216,82 @@ class PositionMonitor:
                 if current_pnl < pos.get("_max_drawdown_usd", 0):
                     pos["_max_drawdown_usd"] = current_pnl
 
-            # --- Quick profit (V3 + V4 min_profit_usd) — PRIORITY 1 ---
-            min_profit = self._get_min_profit_usd(pos)
-            if min_profit > 0:
-                if current_pnl >= min_profit:
-                    self._processing.add(pos_id)
-                    try:
-                        await self._handle_min_profit_close(pos, price, current_pnl)
-                    finally:
-                        self._processing.discard(pos_id)
-                    continue
-
-            # --- Max loss cap (all bots) — PRIORITY 2 ---
-            max_loss = self._get_max_loss_usd(pos)
-            if max_loss > 0:
-                if current_pnl <= -max_loss:
-                    self._processing.add(pos_id)
-                    try:
-                        await self._handle_max_loss_close(pos, price, current_pnl)
-                    finally:
-                        self._processing.discard(pos_id)
-                    continue
-
-            # --- V4 Sniper: Time stop / scratch exit — PRIORITY 3 ---
-            if self.bot_version == "V4" and self.settings:
-                sniper_cfg = self.settings.get("sniper", {})
-                ts_cfg = sniper_cfg.get("time_stop", {})
-                scratch_seconds = ts_cfg.get("scratch_seconds", 0)
-                if scratch_seconds > 0:
-                    entry_time = pos.get("entry_time") or pos.get("created_at")
-                    if entry_time:
-                        try:
-                            if isinstance(entry_time, str):
-                                et = datetime.fromisoformat(entry_time)
-                            else:
-                                et = entry_time
-                            elapsed = (datetime.utcnow() - et).total_seconds()
-                        except Exception:
-                            elapsed = 0
-                        scratch_thresh = ts_cfg.get("scratch_threshold_usd", 0.30)
-                        if elapsed >= scratch_seconds and abs(current_pnl) < scratch_thresh:
-                            self._processing.add(pos_id)
-                            try:
-                                await self._handle_scratch_close(pos, price, current_pnl)
-                            finally:
-                                self._processing.discard(pos_id)
-                            continue
-
-            # --- V4 only: Stale timeout + profit giveback (after min_profit/max_loss) ---
-            if self.bot_version == "V4":
-                v4f = self.settings.get("v4_features", {}) if self.settings else {}
-
-                if v4f.get("stale_exit", True) and self._check_stale_position(pos, current_pnl):
-                    self._processing.add(pos_id)
-                    try:
-                        await self._handle_stale_close(pos, price, current_pnl)
-                    finally:
-                        self._processing.discard(pos_id)
-                    continue
-
-                if self._check_profit_giveback(pos, current_pnl):
-                    self._processing.add(pos_id)
-                    try:
-                        await self._handle_profit_giveback_close(pos, price, current_pnl)
-                    finally:
-                        self._processing.discard(pos_id)
+            # Sorties prioritaires, puis niveau TP courant / SL : une seule action par tick
+            action = self._priority_exit(pos, price, current_pnl)
+            if action is None:
+                # Prix signes (x1 long, x-1 short) : memes comparaisons dans les deux sens
+                sign = 1 if direction == "long" else -1
+                signed_price = price * sign
+                if not pos["tp1_hit"]:
+                    # --- Early profit protection (avant TP1) ---
+                    await self._early_profit_protection(pos, price, direction)
+                    tp_price, on_tp = pos["tp1"], self._handle_tp1_hit
+                elif not pos["tp2_hit"]:
+                    tp_price, on_tp = pos["tp2"], self._handle_tp2_hit
+                else:
+                    tp_price, on_tp = pos["tp3"], self._handle_tp3_hit
+
+                # SL relu apres l'early profit protection, qui peut le deplacer
+                stop_loss = pos["stop_loss"]
+                if signed_price >= tp_price * sign:
+                    action = (on_tp, pos)
+                elif signed_price <= stop_loss * sign:
+                    action = (self._handle_sl_hit, pos, price)
+                else:
                     continue
 
-            # TP1
-            if not pos["tp1_hit"]:
-                # --- Early profit protection (avant TP1) ---
-                await self._early_profit_protection(pos, price, direction)
-
-                tp1_hit = (price >= pos["tp1"]) if direction == "long" else (price <= pos["tp1"])
-                if tp1_hit:
-                    self._processing.add(pos_id)
-                    try:
-                        await self._handle_tp1_hit(pos)
-                    finally:
-                        self._processing.discard(pos_id)
-                    continue
+            handler, *args = action
+            self._processing.add(pos_id)
+            try:
+                await handler(*args)
+            finally:
+                self._processing.discard(pos_id)
+
+    def _priority_exit(self, pos: dict, price: float, current_pnl: float) -> tuple | None:
+        """Sortie prioritaire a executer (handler, *args), par ordre de priorite ; None sinon."""
+        # --- Quick profit (V3 + V4 min_profit_usd) — PRIORITY 1 ---
+        min_profit = self._get_min_profit_usd(pos)
+        if min_profit > 0 and current_pnl >= min_profit:
+            return self._handle_min_profit_close, pos, price, current_pnl
+
+        # --- Max loss cap (all bots) — PRIORITY 2 ---
+        max_loss = self._get_max_loss_usd(pos)
+        if max_loss > 0 and current_pnl <= -max_loss:
+            return self._handle_max_loss_close, pos, price, current_pnl
+
+        if self.bot_version != "V4":
+            return None
 
-                sl_hit = (price <= pos["stop_loss"]) if direction == "long" else (price >= pos["stop_loss"])
-                if sl_hit:
-                    self._processing.add(pos_id)
+        # --- V4 Sniper: Time stop / scratch exit — PRIORITY 3 ---
+        if self.settings:
+            sniper_cfg = self.settings.get("sniper", {})
+            ts_cfg = sniper_cfg.get("time_stop", {})
+            scratch_seconds = ts_cfg.get("scratch_seconds", 0)
+            if scratch_seconds > 0:
+                entry_time = pos.get("entry_time") or pos.get("created_at")
+                if entry_time:
                     try:
-                        await self._handle_sl_hit(pos, price)
-                    finally:
-                        self._processing.discard(pos_id)
-                    continue
+                        if isinstance(entry_time, str):
+                            et = datetime.fromisoformat(entry_time)
+                        else:
+                            et = entry_time
+                        elapsed = (datetime.utcnow() - et).total_seconds()
+                    except Exception:
+                        elapsed = 0
+                    scratch_thresh = ts_cfg.get("scratch_threshold_usd", 0.30)
+                    if elapsed >= scratch_seconds and abs(current_pnl) < scratch_thresh:
+                        return self._handle_scratch_close, pos, price, current_pnl
 
-            # TP2
-            elif not pos["tp2_hit"]:
-                tp2_hit = (price >= pos["tp2"]) if direction == "long" else (price <= pos["tp2"])
-                if tp2_hit:
-                    self._processing.add(pos_id)
-                    try:
-                        await self._handle_tp2_hit(pos)
-                    finally:
-                        self._processing.discard(pos_id)
-                    continue
+        # --- V4 only: Stale timeout + profit giveback (after min_profit/max_loss) ---
+        v4f = self.settings.get("v4_features", {}) if self.settings else {}
 
-                sl_hit = (price <= pos["stop_loss"]) if direction == "long" else (price >= pos["stop_loss"])
-                if sl_hit:
-                    self._processing.add(pos_id)
-                    try:
-                        await self._handle_sl_hit(pos, price)
-                    finally:
-                        self._processing.discard(pos_id)
-                    continue
+        if v4f.get("stale_exit", True) and self._check_stale_position(pos, current_pnl):
+            return self._handle_stale_close, pos, price, current_pnl
 
-            # TP3
-            else:
-                tp3_hit = (price >= pos["tp3"]) if direction == "long" else (price <= pos["tp3"])
-                if tp3_hit:
-                    self._processing.add(pos_id)
-                    try:
-                        await self._handle_tp3_hit(pos)
-                    finally:
-                        self._processing.discard(pos_id)
-                    continue
+        if self._check_profit_giveback(pos, current_pnl):
+            return self._handle_profit_giveback_close, pos, price, current_pnl
 
-                sl_hit = (price <= pos["stop_loss"]) if direction == "long" else (price >= pos["stop_loss"])
-                if sl_hit:
-                    self._processing.add(pos_id)
-                    try:
-                        await self._handle_sl_hit(pos, price)
-                    finally:
-                        self._processing.discard(pos_id)
-                    continue
+        return None
 
     # --- Backup polling ---
 
@@ -370,6 +321,11 @@ class PositionMonitor:
             if pid not in active_ids:
                 del self._positions[pid]
 
+        by_symbol = defaultdict(set)
+        for pid, p in self._positions.items():
+            by_symbol[p["symbol"]].add(pid)
+        self._by_symbol = by_symbol
+
     async def _dynamic_sl_adjust(self):
         """Ajuste dynamiquement le SL si la volatilite augmente (avant TP1 seulement).
         V4: controlled by v4_features.dynamic_sl flag."""
@@ -929,6 +885,9 @@ class PositionMonitor:
             "close_reason": close_reason,
             "pnl_usd": round(pnl_usd, 4),
         })
+        # Marge liberee : la balance en cache n'est plus a jour
+        market_data.invalidate_balance()
+        self._by_symbol[pos["symbol"]].discard(pos["id"])
 
         entry_time = pos.get("entry_time") or pos.get("created_at")
         duration = 0
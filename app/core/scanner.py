@@ -60,7 +60,7 @@ class Scanner:
             await self._scan_cycle_sequential(pairs, modes)
 
     async def _scan_cycle_parallel(self, pairs: list[str], modes: list[str]):
-        """V4 only: Fetch all data in batch then analyze in parallel."""
+        """V4 only: Fetch all data in batch, analyzing each pair as soon as its data arrives."""
         # Collect all needed timeframes
         all_tfs_set = set()
         for mode in modes:
@@ -68,10 +68,7 @@ class Scanner:
             tfs = mode_cfg["timeframes"]["analysis"] + [mode_cfg["timeframes"]["filter"]]
             all_tfs_set.update(tfs)
 
-        # Phase 1: Batch fetch all data
-        all_data = await market_data.fetch_all_data_batch(pairs, list(all_tfs_set))
-
-        # Phase 2: Analyze all pairs x modes in parallel
+        # Analyse de chaque paire x mode, lancee des que les donnees de la paire arrivent
         async def _analyze_one(symbol: str, mode: str, data: dict):
             key = f"{symbol}_{mode}"
             if key in self.cooldowns and datetime.utcnow() < self.cooldowns[key]:
@@ -87,8 +84,7 @@ class Scanner:
         session_edge = getattr(self, '_session_edge_ref', None)
 
         tasks = []
-        for symbol in pairs:
-            data = all_data.get(symbol)
+        async for symbol, data in market_data.fetch_all_data_batch(pairs, list(all_tfs_set)):
             if not data:
                 continue
             if flow_intel:
@@ -98,7 +94,7 @@ class Scanner:
                     fi["session_edge"] = session_edge.get_edge(symbol)
                 data["flow_intelligence"] = fi
             for mode in modes:
-                tasks.append(_analyze_one(symbol, mode, data))
+                tasks.append(asyncio.create_task(_analyze_one(symbol, mode, data)))
 
         if tasks:
             await asyncio.gather(*tasks)
@@ -134,11 +130,11 @@ class Scanner:
                 return
 
             if self._has_active_position(symbol):
-                logger.debug(f"[{self.name}] Signal {symbol} ignore: position deja ouverte")
+                logger.debug("[%s] Signal %s ignore: position deja ouverte", self.name, symbol)
                 return
 
             if self._has_recent_signal(symbol):
-                logger.debug(f"[{self.name}] Signal {symbol} ignore: cooldown anti flip-flop")
+                logger.debug("[%s] Signal %s ignore: cooldown anti flip-flop", self.name, symbol)
                 return
 
             # Ajouter bot_version au signal
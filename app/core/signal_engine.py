@@ -4,7 +4,6 @@ pour produire un signal final avec scoring 0-100.
 Accepte settings en parametre pour supporter V1 et V2.
 """
 import logging
-import math
 from datetime import datetime
 from app.config import SETTINGS, get_mode_config
 from app.core.indicators import compute_all_indicators
@@ -19,9 +18,7 @@ logger = logging.getLogger(__name__)
 
 
 def _safe_val(val, default=0):
-    if val is None:
-        return default
-    if isinstance(val, float) and math.isnan(val):
+    if val is None or val != val:
         return default
     return val
 
@@ -337,21 +334,21 @@ async def analyze_pair(symbol: str, market_data_dict: dict, mode: str, settings=
     direction_score = direction["score"]
     sentiment_bias = sentiment["bias"]
 
-    if sentiment_bias == "bearish" and entry["direction"] == "long":
+    if sentiment_bias == "bearish" and entry.direction == "long":
         direction_score = int(direction_score * 0.6)
-    elif sentiment_bias == "bearish" and entry["direction"] == "short":
+    elif sentiment_bias == "bearish" and entry.direction == "short":
         direction_score = int(min(100, direction_score * 1.3))
-    elif sentiment_bias == "bullish" and entry["direction"] == "long":
+    elif sentiment_bias == "bullish" and entry.direction == "long":
         direction_score = int(min(100, direction_score * 1.3))
-    elif sentiment_bias == "bullish" and entry["direction"] == "short":
+    elif sentiment_bias == "bullish" and entry.direction == "short":
         direction_score = int(direction_score * 0.6)
 
     # =========================================
     # RISK MANAGEMENT
     # =========================================
     risk = calculate_risk(
-        entry_price=entry["entry_price"],
-        direction=entry["direction"],
+        entry_price=entry.entry_price,
+        direction=entry.direction,
         atr=atr_current,
         mode_config=mode_cfg,
         indicators=indicators_analysis,
@@ -362,9 +359,9 @@ async def analyze_pair(symbol: str, market_data_dict: dict, mode: str, settings=
     # SCORING FINAL (4 couches)
     # =========================================
     rr_score = calculate_rr_score(
-        entry["entry_price"], risk["stop_loss"], risk["tp1"]
+        entry.entry_price, risk["stop_loss"], risk["tp1"]
     )
-    setup_score = entry["pattern_score"] + entry["vol_score"] + rr_score + entry.get("confluence_score", 0)
+    setup_score = entry.pattern_score + entry.vol_score + rr_score + entry.confluence_score
     setup_score = min(100, max(0, setup_score + candle_modifier))
 
     # V4 ONLY: Regime modifier sur le setup_score + VWAP confluence
@@ -372,7 +369,7 @@ async def analyze_pair(symbol: str, market_data_dict: dict, mode: str, settings=
     mtf_modifier = 0
     vwap_modifier = 0
     if is_v4 and v4f.get("regime_detection", False) and regime_info:
-        regime_mod = regime_score_modifier(market_regime, entry["type"], regime_info.get("confidence", 0))
+        regime_mod = regime_score_modifier(market_regime, entry.type, regime_info.get("confidence", 0))
         setup_score = max(0, min(100, setup_score + regime_mod))
     if is_v4 and v4f.get("mtf_confluence", False):
         mtf_modifier = int(mtf_confluence)
@@ -381,7 +378,7 @@ async def analyze_pair(symbol: str, market_data_dict: dict, mode: str, settings=
         last_close = _safe_val(indicators_analysis.get("last_close"), 0)
         if vwap_val > 0 and last_close > 0:
             vwap_dist_pct = (last_close - vwap_val) / vwap_val * 100
-            if entry["direction"] == "long":
+            if entry.direction == "long":
                 if vwap_dist_pct > 0.1:
                     vwap_modifier = 5   # LONG above VWAP
                 elif vwap_dist_pct < -0.5:
@@ -392,7 +389,7 @@ async def analyze_pair(symbol: str, market_data_dict: dict, mode: str, settings=
                 elif vwap_dist_pct > 0.5:
                     vwap_modifier = -5  # SHORT far above VWAP
 
-    if entry["direction"] == "long":
+    if entry.direction == "long":
         sentiment_normalized = (sentiment_score + 100) / 2
     else:
         sentiment_normalized = (-sentiment_score + 100) / 2
@@ -457,13 +454,13 @@ async def analyze_pair(symbol: str, market_data_dict: dict, mode: str, settings=
                         _candle_pattern = pat_name
                         break
                 signal_ctx = {
-                    "setup_type": entry["type"],
+                    "setup_type": entry.type,
                     "symbol": symbol,
                     "mode": mode,
                     "regime": market_regime,
                     "hour_utc": now.hour,
                     "score": final_score,
-                    "direction": entry["direction"],
+                    "direction": entry.direction,
                     "mtf_confluence": mtf_confluence,
                     "candle_pattern": _candle_pattern,
                 }
@@ -474,7 +471,7 @@ async def analyze_pair(symbol: str, market_data_dict: dict, mode: str, settings=
         flow_data = market_data_dict.get("flow_intelligence")
         flow_cfg = s.get("flow_intelligence", {})
         if flow_data and v4f.get("order_flow", False) and not flow_data.get("is_stale", True):
-            _dir = entry["direction"]
+            _dir = entry.direction
 
             # +5 pts if CVD confirms direction
             cvd_info = flow_data.get("cvd", {})
@@ -617,7 +614,7 @@ async def analyze_pair(symbol: str, market_data_dict: dict, mode: str, settings=
     reasons = []
     for s_item in direction["signals"]:
         reasons.append(s_item)
-    reasons.append(entry["reason"])
+    reasons.append(entry.reason)
     if candle_check.get("reason") and candle_check["reason"] != "bougies neutres":
         reasons.append(f"Bougies: {candle_check['reason']}")
     reasons.append(f"Funding rate {market_data_dict.get('funding_rate', 0):+.4f}%")
@@ -658,14 +655,14 @@ async def analyze_pair(symbol: str, market_data_dict: dict, mode: str, settings=
         "type": "signal",
         "symbol": symbol,
         "mode": mode,
-        "direction": entry["direction"],
+        "direction": entry.direction,
         "score": final_score,
-        "entry_price": entry["entry_price"],
+        "entry_price": entry.entry_price,
         "stop_loss": risk["stop_loss"],
         "tp1": risk["tp1"],
         "tp2": risk["tp2"],
         "tp3": risk["tp3"],
-        "setup_type": entry["type"],
+        "setup_type": entry.type,
         "leverage": risk["leverage"],
         "risk_pct": risk["risk_pct"],
         "rr_ratio": risk["rr_ratio"],
@@ -682,7 +679,7 @@ async def analyze_pair(symbol: str, market_data_dict: dict, mode: str, settings=
             "bias": sentiment_bias,
             "fear_greed": sentiment.get("fear_greed", 50),
         },
-        "all_setups": entry.get("all_setups", []),
+        "all_setups": list(entry.all_setups),
     }
 
     # V4 only: enrichments for learning context propagation
@@ -59,7 +59,7 @@ class TradeLearner:
         filtered = [s for s in allowed_setups if s not in disabled]
         if len(filtered) < len(allowed_setups):
             skipped = [s for s in allowed_setups if s in disabled]
-            logger.debug(f"LEARNING: {symbol} ({mode}) - skip {skipped}")
+            logger.debug("LEARNING: %s (%s) - skip %s", symbol, mode, skipped)
         return filtered
 
     async def get_all_stats(self) -> list[dict]:
@@ -175,6 +175,10 @@ async def lifespan(app: FastAPI):
     monitor_v2_task.cancel()
     monitor_v3_task.cancel()
     monitor_v4_task.cancel()
+    await paper_trader_v1.stop()
+    await paper_trader_v2.stop()
+    await paper_trader_v3.stop()
+    await paper_trader_v4.stop()
     session_edge_task.cancel()
     await flow_intelligence_v4.stop()
     flow_intel_task.cancel()
@@ -0,0 +1,39 @@
+import itertools
+import math
+import unittest
+
+import pandas as pd
+
+from app.core.market_regime import detect_regime, detect_regime_batch
+
+NAN = float("nan")
+
+
+class DetectRegimeBatchTest(unittest.TestCase):
+    def test_batch_matches_scalar(self):
+        adx_values = [NAN, 0, 10, 19.99, 20, 21.9, 22, 24.99, 25, 35, 60]
+        bb_values = [NAN, 0, 1.0, 1.49, 1.5, 1.99, 2.0, 3.5, 5.0, 5.01, 9.0]
+        # (last_atr, last_atr_mean50) : ratio bas / normal / > 2, ATR ou moyenne manquante
+        atr_values = [(1.0, 1.0), (0.5, 1.0), (2.0, 1.0), (2.01, 1.0), (4.0, 1.0), (NAN, 1.0), (1.0, NAN), (1.0, 0.0)]
+
+        rows, expected = [], []
+        for adx, bb_bw, (atr, atr_mean) in itertools.product(adx_values, bb_values, atr_values):
+            expected.append(detect_regime({
+                "last_adx": adx, "last_bb_bandwidth": bb_bw, "last_atr": atr, "last_atr_mean50": atr_mean,
+            }))
+            # Ratio tel que detect_regime le construit ; NaN quand la moyenne ATR est absente ou nulle
+            if math.isnan(atr_mean) or atr_mean <= 0:
+                atr_ratio = NAN
+            else:
+                atr_ratio = (0 if math.isnan(atr) else atr) / atr_mean
+            rows.append({"adx": adx, "bb_bw": bb_bw, "atr_ratio": atr_ratio})
+
+        batch = detect_regime_batch(pd.DataFrame(rows))
+        for exp, (_, got) in zip(expected, batch.iterrows()):
+            self.assertEqual(got["regime"], exp["regime"])
+            self.assertAlmostEqual(got["confidence"], exp["confidence"], places=9)
+            self.assertAlmostEqual(got["atr_ratio"], exp["atr_ratio"], places=9)
+
+
+if __name__ == "__main__":
+    unittest.main()
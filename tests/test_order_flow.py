@@ -0,0 +1,71 @@
+import random
+import time
+import unittest
+
+from app.core.order_flow import OrderFlowTracker, _TradeBuffer
+
+
+def _window(rows, cutoff):
+    buy = sum(v for ts, v, b, _ in rows if ts >= cutoff and b)
+    sell = sum(v for ts, v, b, _ in rows if ts >= cutoff and not b)
+    return buy, sell
+
+
+class TradeBufferOrderTest(unittest.TestCase):
+    def test_out_of_order_deals_stay_sorted(self):
+        rng = random.Random(1)
+        rows = [(1000.0 + i, rng.uniform(0.1, 5), rng.random() < 0.5, 100 + i) for i in range(300)]
+        shuffled = rows[:]
+        # Melange local (trades en retard de quelques positions) + snapshot rejoue
+        for i in range(0, len(shuffled) - 5, 7):
+            shuffled[i], shuffled[i + 5] = shuffled[i + 5], shuffled[i]
+        shuffled += rows[250:260]
+
+        buf = _TradeBuffer(maxlen=1000)
+        for row in shuffled:
+            buf.append(*row)
+
+        ts = [r[0] for r in buf]
+        self.assertEqual(ts, sorted(ts))
+        expected = sorted(shuffled, key=lambda r: r[0])
+        for cutoff in (999.0, 1050.0, 1150.5, 1255.0, 1299.0, 1400.0):
+            buy, sell = buf.window_volumes(cutoff)
+            exp_buy, exp_sell = _window(expected, cutoff)
+            self.assertAlmostEqual(buy, exp_buy, places=6)
+            self.assertAlmostEqual(sell, exp_sell, places=6)
+        self.assertEqual(buf.price[buf.index_at(1100.0)], 200)
+        self.assertEqual(buf.price[buf.n - 1], 399)
+
+    def test_late_deal_with_full_buffer(self):
+        buf = _TradeBuffer(maxlen=10)
+        for i in range(25):
+            buf.append(float(i), 1.0, True, float(i))
+        buf.append(20.5, 2.0, False, 20.5)  # retard, reste dans les 10 derniers
+        buf.append(0.0, 3.0, False, 0.0)  # plus ancien que la fenetre : aussitot ecarte
+        self.assertEqual([r[0] for r in buf], [16, 17, 18, 19, 20, 20.5, 21, 22, 23, 24])
+        self.assertEqual(buf.window_volumes(20.0), (5.0, 2.0))
+
+
+class TrackerOrderTest(unittest.TestCase):
+    def test_delta_independent_of_arrival_order(self):
+        now = time.time()
+        deals = [
+            {"p": 100 + i * 0.01, "v": 1 + i % 3, "T": 1 + i % 2, "t": int((now - 590 + i) * 1000)}
+            for i in range(580)
+        ]
+        ordered, late = OrderFlowTracker(["BTC/USDT:USDT"]), OrderFlowTracker(["BTC/USDT:USDT"])
+        for d in deals:
+            ordered._process_deal("BTC/USDT:USDT", d)
+        shuffled = deals[:]
+        random.Random(2).shuffle(shuffled)
+        for d in shuffled:
+            late._process_deal("BTC/USDT:USDT", d)
+
+        for window in (60, 300, 900):
+            self.assertEqual(ordered.get_delta("BTC/USDT:USDT", window), late.get_delta("BTC/USDT:USDT", window))
+        self.assertEqual(ordered.get_cvd_divergence("BTC/USDT:USDT"), late.get_cvd_divergence("BTC/USDT:USDT"))
+        self.assertEqual(ordered.get_cvd_divergence_v2("BTC/USDT:USDT"), late.get_cvd_divergence_v2("BTC/USDT:USDT"))
+
+
+if __name__ == "__main__":
+    unittest.main()